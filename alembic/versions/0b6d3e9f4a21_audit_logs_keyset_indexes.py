@@ -0,0 +1,42 @@
+"""audit_logs keyset indexes
+
+Revision ID: 0b6d3e9f4a21
+Revises: f1b5c8e2a730
+Create Date: 2026-10-17 19:42:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6d3e9f4a21'
+down_revision: Union[str, Sequence[str], None] = 'f1b5c8e2a730'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # indexes on the partitioned parent cascade to every partition
+    op.create_index('ix_audit_logs_occurred_at_id', 'audit_logs', ['occurred_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_user_id_occurred_at_id', 'audit_logs', ['user_id', 'occurred_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_session_id_occurred_at_id', 'audit_logs', ['session_id', 'occurred_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_action_occurred_at_id', 'audit_logs', ['action', 'occurred_at', 'id'], unique=False)
+    # covered by the composite indexes above
+    op.drop_index('ix_audit_logs_occurred_at', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_session_id', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_id', table_name='audit_logs')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_audit_logs_user_id', 'audit_logs', ['user_id'], unique=False)
+    op.create_index('ix_audit_logs_session_id', 'audit_logs', ['session_id'], unique=False)
+    op.create_index('ix_audit_logs_occurred_at', 'audit_logs', ['occurred_at'], unique=False)
+    op.drop_index('ix_audit_logs_action_occurred_at_id', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_session_id_occurred_at_id', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_id_occurred_at_id', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_occurred_at_id', table_name='audit_logs')
@@ -0,0 +1,28 @@
+"""sessions status/expires_at index
+
+Revision ID: 3c1f9a7d2b64
+Revises: 737cce098026
+Create Date: 2026-10-17 09:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2b64'
+down_revision: Union[str, Sequence[str], None] = '737cce098026'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_sessions_status_expires_at', 'sessions', ['status', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sessions_status_expires_at', table_name='sessions')
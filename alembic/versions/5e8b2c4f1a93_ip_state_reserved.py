@@ -0,0 +1,47 @@
+"""ip_state RESERVED
+
+Revision ID: 5e8b2c4f1a93
+Revises: 3c1f9a7d2b64
+Create Date: 2026-10-17 11:02:15.482917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b2c4f1a93'
+down_revision: Union[str, Sequence[str], None] = '3c1f9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # reserved addresses are materialized as rows in sparse pool mode
+    op.execute("ALTER TYPE ip_state ADD VALUE IF NOT EXISTS 'RESERVED'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM ip_pool WHERE state = 'RESERVED'")
+
+    op.execute("ALTER TYPE ip_state RENAME TO ip_state_old")
+
+    sa.Enum(
+        'FREE',
+        'ASSIGNED',
+        'QUARANTINED',
+        name='ip_state'
+    ).create(op.get_bind())
+
+    op.execute("""
+        ALTER TABLE ip_pool
+        ALTER COLUMN state
+        TYPE ip_state
+        USING state::text::ip_state;
+    """)
+
+    op.execute("DROP TYPE ip_state_old")
@@ -0,0 +1,35 @@
+"""sessions keyset indexes
+
+Revision ID: 7c1e4a8d2f56
+Revises: 0b6d3e9f4a21
+Create Date: 2026-10-17 20:18:09.553417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4a8d2f56'
+down_revision: Union[str, Sequence[str], None] = '0b6d3e9f4a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_sessions_started_at_id', 'sessions', ['started_at', 'id'], unique=False)
+    op.create_index('ix_sessions_user_id_started_at_id', 'sessions', ['user_id', 'started_at', 'id'], unique=False)
+    op.create_index('ix_sessions_status_started_at_id', 'sessions', ['status', 'started_at', 'id'], unique=False)
+    # covered by ix_sessions_user_id_started_at_id
+    op.drop_index(op.f('ix_sessions_user_id'), table_name='sessions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_sessions_user_id'), 'sessions', ['user_id'], unique=False)
+    op.drop_index('ix_sessions_status_started_at_id', table_name='sessions')
+    op.drop_index('ix_sessions_user_id_started_at_id', table_name='sessions')
+    op.drop_index('ix_sessions_started_at_id', table_name='sessions')
@@ -0,0 +1,55 @@
+"""ip_pool leases
+
+Revision ID: b7e3f1c9d248
+Revises: 9a4d6e0b7c15
+Create Date: 2026-10-17 13:41:07.556120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f1c9d248'
+down_revision: Union[str, Sequence[str], None] = '9a4d6e0b7c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TYPE ip_state ADD VALUE IF NOT EXISTS 'LEASED'")
+    op.add_column('ip_pool', sa.Column('lease_owner', sa.String(), nullable=True))
+    op.add_column('ip_pool', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_ip_pool_lease_owner'), 'ip_pool', ['lease_owner'], unique=False)
+    op.create_index(op.f('ix_ip_pool_lease_expires_at'), 'ip_pool', ['lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ip_pool_lease_expires_at'), table_name='ip_pool')
+    op.drop_index(op.f('ix_ip_pool_lease_owner'), table_name='ip_pool')
+    op.drop_column('ip_pool', 'lease_expires_at')
+    op.drop_column('ip_pool', 'lease_owner')
+
+    op.execute("UPDATE ip_pool SET state = 'FREE' WHERE state = 'LEASED'")
+    op.execute("ALTER TYPE ip_state RENAME TO ip_state_old")
+
+    sa.Enum(
+        'FREE',
+        'ASSIGNED',
+        'QUARANTINED',
+        'RESERVED',
+        name='ip_state'
+    ).create(op.get_bind())
+
+    op.execute("""
+        ALTER TABLE ip_pool
+        ALTER COLUMN state
+        TYPE ip_state
+        USING state::text::ip_state;
+    """)
+
+    op.execute("DROP TYPE ip_state_old")
@@ -0,0 +1,28 @@
+"""challenges expires_at index
+
+Revision ID: d4f7a2b9e618
+Revises: c2a8d5e4f903
+Create Date: 2026-10-17 16:05:12.402911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f7a2b9e618'
+down_revision: Union[str, Sequence[str], None] = 'c2a8d5e4f903'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_challenges_expires_at'), 'challenges', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_challenges_expires_at'), table_name='challenges')
@@ -0,0 +1,98 @@
+"""partition audit_logs by month
+
+Revision ID: f1b5c8e2a730
+Revises: e9c3b6d1f247
+Create Date: 2026-10-17 17:31:08.650214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b5c8e2a730'
+down_revision: Union[str, Sequence[str], None] = 'e9c3b6d1f247'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('audit_logs', 'audit_logs_legacy')
+    op.drop_index('ix_audit_logs_session_id', table_name='audit_logs_legacy')
+    op.drop_index('ix_audit_logs_user_id', table_name='audit_logs_legacy')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq RENAME TO audit_logs_legacy_id_seq')
+
+    op.execute(sa.schema.CreateSequence(sa.Sequence('audit_logs_id_seq')))
+    op.create_table('audit_logs',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('audit_logs_id_seq')"), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('session_id', sa.String(), nullable=True),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('detail', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'occurred_at'),
+    postgresql_partition_by='RANGE (occurred_at)'
+    )
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.create_index(op.f('ix_audit_logs_occurred_at'), 'audit_logs', ['occurred_at'], unique=False)
+    op.create_index(op.f('ix_audit_logs_session_id'), 'audit_logs', ['session_id'], unique=False)
+    op.create_index(op.f('ix_audit_logs_user_id'), 'audit_logs', ['user_id'], unique=False)
+
+    # one partition per month from the oldest row up to two months ahead, so
+    # existing rows never end up in the default partition
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            m date := date_trunc('month', COALESCE((SELECT min(occurred_at) FROM audit_logs_legacy), now()))::date;
+            last date := (date_trunc('month', now()) + interval '2 months')::date;
+        BEGIN
+            WHILE m <= last LOOP
+                EXECUTE format(
+                    'CREATE TABLE audit_logs_p%s PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    to_char(m, 'YYYYMM'), m, (m + interval '1 month')::date
+                );
+                m := (m + interval '1 month')::date;
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    op.execute(
+        'INSERT INTO audit_logs (id, occurred_at, user_id, session_id, action, detail) '
+        'SELECT id, occurred_at, user_id, session_id, action, detail FROM audit_logs_legacy'
+    )
+    op.execute("SELECT setval('audit_logs_id_seq', COALESCE((SELECT max(id) FROM audit_logs), 0) + 1, false)")
+    op.drop_table('audit_logs_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('audit_logs', 'audit_logs_partitioned')
+    op.drop_index('ix_audit_logs_occurred_at', table_name='audit_logs_partitioned')
+    op.drop_index('ix_audit_logs_session_id', table_name='audit_logs_partitioned')
+    op.drop_index('ix_audit_logs_user_id', table_name='audit_logs_partitioned')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq RENAME TO audit_logs_partitioned_id_seq')
+
+    op.create_table('audit_logs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('session_id', sa.String(), nullable=True),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('detail', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_audit_logs_session_id'), 'audit_logs', ['session_id'], unique=False)
+    op.create_index(op.f('ix_audit_logs_user_id'), 'audit_logs', ['user_id'], unique=False)
+    op.execute(
+        'INSERT INTO audit_logs (id, occurred_at, user_id, session_id, action, detail) '
+        'SELECT id, occurred_at, user_id, session_id, action, detail FROM audit_logs_partitioned'
+    )
+    op.execute("SELECT setval('audit_logs_id_seq', COALESCE((SELECT max(id) FROM audit_logs), 0) + 1, false)")
+    # dropping the parent drops every partition and the sequence it owns
+    op.drop_table('audit_logs_partitioned')
@@ -1,11 +1,12 @@
 from typing import Generator
 
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
 from app import db
 from app.models.user import User
 from app.services import security
+from app.services.principal_cache import Principal, principal_cache
 from app.config import settings
 
 
@@ -14,35 +15,48 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
-def get_current_user(authorization: str | None = Header(default=None), session: Session = Depends(get_db)) -> User:
+def _resolve_principal(authorization: str | None, session: Session, scope: str, missing_detail: str) -> Principal:
     if not authorization or not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing access token")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=missing_detail)
     token = authorization.split(" ", 1)[1]
-    payload = security.decode_token(token)
-    if not payload or payload.get("scope") != "access":
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user_id = payload.get("sub")
-    user = session.query(User).filter(User.id == int(user_id)).first()
-    if not user or not user.is_active:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not allowed")
-    return user
+    # hit: no JWT decode and no users query; the route's db session never connects
+    principal = principal_cache.get(token)
+    if principal is not None:
+        if principal.scope != scope:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        return principal
 
-def get_current_proofed_user(authorization: str | None = Header(default=None), session: Session = Depends(get_db)) -> User:
-    if not authorization or not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing proof token")
-    token = authorization.split(" ", 1)[1]
     payload = security.decode_token(token)
-    if not payload or payload.get("scope") != "proof":
+    if not payload or payload.get("scope") != scope:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
     user_id = payload.get("sub")
     user = session.query(User).filter(User.id == int(user_id)).first()
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not allowed")
-    return user
+    principal = Principal(id=user.id, username=user.username, scope=scope)
+    principal_cache.put(token, principal, float(payload["exp"]))
+    return principal
+
+
+def get_current_user(authorization: str | None = Header(default=None), session: Session = Depends(get_db)) -> Principal:
+    return _resolve_principal(authorization, session, "access", "Missing access token")
+
+
+def get_current_proofed_user(authorization: str | None = Header(default=None), session: Session = Depends(get_db)) -> Principal:
+    return _resolve_principal(authorization, session, "proof", "Missing proof token")
 
 
 def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
     if x_admin_token != settings.admin_token:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token invalid")
+
+
+def client_ip(request: Request) -> str:
+    if settings.rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # the right-most entry is the one our own proxy appended
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
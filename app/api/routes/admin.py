@@ -1,61 +1,246 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status as http_status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status as http_status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import literal, select, tuple_
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, require_admin
+from app.api.pagination import NEXT_CURSOR_HEADER, ExportFormat, decode_cursor, encode_cursor, export_response
+from app.config import settings
+from app.models.admin_job import AdminJob
 from app.models.audit import AuditLog
+from app.models.ip_pool import IpState
 from app.models.session import Session as SessionModel, SessionStatus
-from app.schemas.admin import AdminSessionView, AuditEntry
-from app.services.wireguard import wireguard_service
+from app.models.user import User
+from app.schemas.admin import AdminJobView, AdminSessionView, AdminStatsView, AuditEntry, BulkRevokeRequest
+from app.services.admin_jobs import JOB_BULK_REVOKE, create_job
+from app.services.ip_alloc import pool_size, quarantine_sessions
+from app.services.ip_pool_init import sync_ip_pool
+from app.services.principal_cache import principal_cache
+from app.services.reconciler import reconcile_once
+from app.services.revoker import expiry_deadlines
+from app.services.stats import IP_PREFIX, SESSION_PREFIX, session_status_changed, stats_cache
+from app.services.wg_outbox import enqueue_peer_op
 from app.services.audit import audit
 
 router = APIRouter(dependencies=[Depends(require_admin)])
 
 
-@router.get("/v1/admin/sessions", response_model=list[AdminSessionView])
-def list_sessions(status: str | None = Query(default=None), db: Session = Depends(get_db)) -> list[AdminSessionView]:
-    query = db.query(SessionModel)
+_SESSION_COLUMNS = (
+    SessionModel.id.label("session_id"),
+    SessionModel.user_id,
+    SessionModel.status,
+    SessionModel.expires_at,
+    SessionModel.started_at,
+)
+
+
+def _session_filters(
+    user_id: int | None = Query(default=None),
+    status: str | None = Query(default=None),
+    since: datetime | None = Query(default=None, description="started_at, inclusive"),
+    until: datetime | None = Query(default=None, description="started_at, exclusive"),
+) -> list:
+    filters = []
+    if user_id is not None:
+        filters.append(SessionModel.user_id == user_id)
     if status:
         try:
             status_enum = SessionStatus(status)
         except ValueError:
             raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="Bad status filter")
-        query = query.filter(SessionModel.status == status_enum)
-    sessions = query.all()
+        filters.append(SessionModel.status == status_enum)
+    if since:
+        filters.append(SessionModel.started_at >= since)
+    if until:
+        filters.append(SessionModel.started_at < until)
+    return filters
+
+
+@router.get("/v1/admin/sessions", response_model=list[AdminSessionView])
+def list_sessions(
+    response: Response,
+    filters: list = Depends(_session_filters),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=200, ge=1, le=settings.admin_page_size_max),
+    db: Session = Depends(get_db),
+) -> list[AdminSessionView]:
+    """Newest first; pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next page."""
+    stmt = select(*_SESSION_COLUMNS).where(*filters)
+    if cursor:
+        started_at, session_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(SessionModel.started_at, SessionModel.id)
+            < tuple_(literal(started_at, SessionModel.started_at.type), literal(str(session_id)))
+        )
+    rows = db.execute(stmt.order_by(SessionModel.started_at.desc(), SessionModel.id.desc()).limit(limit)).all()
+    if len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].started_at, rows[-1].session_id)
     return [
         AdminSessionView(
-            session_id=s.id,
-            user_id=s.user_id,
-            status=s.status.value,
-            expires_at=s.expires_at,
-            started_at=s.started_at,
+            session_id=row.session_id,
+            user_id=row.user_id,
+            status=row.status.value,
+            expires_at=row.expires_at,
+            started_at=row.started_at,
         )
-        for s in sessions
+        for row in rows
     ]
 
 
+@router.get("/v1/admin/sessions/export")
+def export_sessions(
+    filters: list = Depends(_session_filters),
+    format: ExportFormat = Query(default="ndjson"),
+) -> StreamingResponse:
+    """Stream every matching session, oldest first, as NDJSON or CSV."""
+    stmt = select(*_SESSION_COLUMNS).where(*filters).order_by(SessionModel.started_at, SessionModel.id)
+    return export_response(stmt, format, "sessions")
+
+
 @router.post("/v1/admin/sessions/{session_id}/revoke")
 def admin_revoke(session_id: str, db: Session = Depends(get_db)) -> dict[str, str]:
-    sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    # row lock: a bulk job or the revoker may be changing the same session right now
+    sess = db.query(SessionModel).filter(SessionModel.id == session_id).with_for_update().first()
     if not sess:
         raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Session not found")
+    if sess.status != SessionStatus.ACTIVE:
+        # already revoked or expired: its IP and peer were handled then, nothing to do twice
+        raise HTTPException(status_code=http_status.HTTP_409_CONFLICT, detail="Session not active")
     now = datetime.now(timezone.utc)
+    session_status_changed(db, SessionStatus.ACTIVE, SessionStatus.REVOKED)
     sess.status = SessionStatus.REVOKED
     sess.updated_at = now
     db.add(sess)
+    quarantine_sessions(db, [sess.id])
+    enqueue_peer_op(db, "remove", sess.id, sess.client_pubkey)
     db.commit()
-    wireguard_service.remove_peer(sess.id, sess.client_pubkey)
-    audit(db, action="admin_revoke", user_id=sess.user_id, session_id=sess.id)
+    expiry_deadlines.discard(sess.id)
+    audit(db, action="admin_revoke", user_id=sess.user_id, session_id=sess.id, durable=True)
     return {"status": sess.status.value}
 
 
-@router.get("/v1/admin/audit", response_model=list[AuditEntry])
-def audit_list(session_id: str | None = Query(default=None), db: Session = Depends(get_db)) -> list[AuditEntry]:
-    query = db.query(AuditLog)
+@router.post("/v1/admin/sessions/bulk-revoke", response_model=AdminJobView, status_code=http_status.HTTP_202_ACCEPTED)
+def admin_bulk_revoke(payload: BulkRevokeRequest, db: Session = Depends(get_db)) -> AdminJobView:
+    """Queue a job revoking every matching ACTIVE session; poll ``/v1/admin/jobs/{job_id}`` for progress."""
+    params = payload.model_dump(exclude_none=True, exclude={"all"})
+    if not params and not payload.all:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="No criteria given, set all=true to revoke everything")
+    if payload.since and payload.until and payload.since >= payload.until:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="since must be before until")
+    job = create_job(db, JOB_BULK_REVOKE, params)
+    audit(db, action="admin_bulk_revoke_requested", user_id=payload.user_id, detail=f"job {job.id}", durable=True)
+    return _job_view(job)
+
+
+def _job_view(job: AdminJob) -> AdminJobView:
+    return AdminJobView(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status.value,
+        total=job.total,
+        processed=job.processed,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.get("/v1/admin/jobs/{job_id}", response_model=AdminJobView)
+def admin_job_status(job_id: str, db: Session = Depends(get_db)) -> AdminJobView:
+    job = db.get(AdminJob, job_id)
+    if not job:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return _job_view(job)
+
+
+@router.post("/v1/admin/users/{user_id}/deactivate")
+def admin_deactivate_user(user_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="User not found")
+    user.is_active = False
+    db.add(user)
+    db.commit()
+    # tokens cached in other processes stay valid until principal_cache_ttl_seconds runs out
+    principal_cache.invalidate_user(user.id)
+    audit(db, action="admin_user_deactivated", user_id=user.id, durable=True)
+    return {"status": "deactivated"}
+
+
+@router.get("/v1/admin/stats", response_model=AdminStatsView)
+def admin_stats(db: Session = Depends(get_db)) -> AdminStatsView:
+    """IP pool and session counts from the maintained counters; no table scans."""
+    counters, as_of = stats_cache.get(db)
+    ip_pool = {state.value: max(0, counters.get(IP_PREFIX + state.value, 0)) for state in IpState}
+    sessions = {status.value: max(0, counters.get(SESSION_PREFIX + status.value, 0)) for status in SessionStatus}
+    if settings.ip_pool_mode == "sparse":
+        # FREE has no rows in sparse mode: everything in the CIDR that is not stored
+        stored = sum(n for state, n in ip_pool.items() if state != IpState.FREE.value)
+        ip_pool[IpState.FREE.value] = max(0, pool_size() - stored)
+    usable = sum(ip_pool.values()) - ip_pool[IpState.RESERVED.value]
+    return AdminStatsView(
+        ip_pool=ip_pool,
+        sessions=sessions,
+        pool_usable=usable,
+        pool_utilization=round(ip_pool[IpState.ASSIGNED.value] / usable, 4) if usable else 0.0,
+        as_of=as_of,
+    )
+
+
+@router.post("/v1/admin/ip-pool/resync")
+def ip_pool_resync(db: Session = Depends(get_db)) -> dict[str, str]:
+    sync_ip_pool(db, force=True)
+    audit(db, action="admin_ip_pool_resync", durable=True)
+    return {"status": "synced"}
+
+
+@router.post("/v1/admin/wg/reconcile")
+async def wg_reconcile() -> dict:
+    report = await reconcile_once()
+    return report.as_dict()
+
+
+def _audit_filters(
+    user_id: int | None = Query(default=None),
+    session_id: str | None = Query(default=None),
+    action: str | None = Query(default=None),
+    since: datetime | None = Query(default=None, description="inclusive"),
+    until: datetime | None = Query(default=None, description="exclusive"),
+) -> list:
+    # each equality filter has a matching (column, occurred_at, id) index
+    filters = []
+    if user_id is not None:
+        filters.append(AuditLog.user_id == user_id)
     if session_id:
-        query = query.filter(AuditLog.session_id == session_id)
-    logs = query.order_by(AuditLog.occurred_at.desc()).limit(200).all()
+        filters.append(AuditLog.session_id == session_id)
+    if action:
+        filters.append(AuditLog.action == action)
+    if since:
+        filters.append(AuditLog.occurred_at >= since)
+    if until:
+        filters.append(AuditLog.occurred_at < until)
+    return filters
+
+
+@router.get("/v1/admin/audit", response_model=list[AuditEntry])
+def audit_list(
+    response: Response,
+    filters: list = Depends(_audit_filters),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=200, ge=1, le=settings.admin_page_size_max),
+    db: Session = Depends(get_db),
+) -> list[AuditEntry]:
+    """Newest first; pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next page."""
+    query = db.query(AuditLog).filter(*filters)
+    if cursor:
+        occurred_at, log_id = decode_cursor(cursor, int)
+        query = query.filter(tuple_(AuditLog.occurred_at, AuditLog.id) < tuple_(literal(occurred_at, AuditLog.occurred_at.type), log_id))
+    logs = query.order_by(AuditLog.occurred_at.desc(), AuditLog.id.desc()).limit(limit).all()
+    if len(logs) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(logs[-1].occurred_at, logs[-1].id)
     return [
         AuditEntry(
             occurred_at=log.occurred_at,
@@ -66,3 +251,27 @@ def audit_list(session_id: str | None = Query(default=None), db: Session = Depen
         )
         for log in logs
     ]
+
+
+@router.get("/v1/admin/audit/export")
+def audit_export(
+    request: Request,
+    filters: list = Depends(_audit_filters),
+    format: ExportFormat = Query(default="ndjson"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """Stream every matching entry, oldest first, as NDJSON or CSV."""
+    stmt = (
+        select(
+            AuditLog.id,
+            AuditLog.occurred_at,
+            AuditLog.user_id,
+            AuditLog.session_id,
+            AuditLog.action,
+            AuditLog.detail,
+        )
+        .where(*filters)
+        .order_by(AuditLog.occurred_at, AuditLog.id)
+    )
+    audit(db, action="admin_audit_export", detail=str(request.url.query) or None, durable=True)
+    return export_response(stmt, format, "audit")
@@ -1,10 +1,11 @@
-from datetime import datetime, timedelta, timezone
+import math
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import get_db, get_current_user
-from app.models.challenge import Challenge, ChallengeType
+from app.api.deps import client_ip, get_db, get_current_user
+from app.models.challenge import ChallengeType
 from app.models.user import User
 from app.config import settings
 from app.schemas.auth import (
@@ -15,37 +16,103 @@ from app.schemas.auth import (
 )
 from app.services import security
 from app.services.audit import audit
+from app.services.challenge_store import (
+    ChallengeConsumed,
+    ChallengeExpired,
+    ChallengeForbidden,
+    ChallengeNotFound,
+    ChallengeRecord,
+    ChallengeTooManyTries,
+    challenge_store,
+)
+from app.services.password_pool import PasswordPoolSaturated, password_pool
+from app.services.principal_cache import Principal
+from app.services.rate_limit import RateLimited, rate_limiter
 
 router = APIRouter()
 CHALLENGE_TTL_SECONDS = 120
 
 
-def _ensure_aware(dt: datetime) -> datetime:
-    """Normalize naive datetimes from DB to UTC-aware to avoid comparison errors."""
-    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt
+def _rate_limit(scope: str, key: str, per_minute: int, burst: int) -> None:
+    try:
+        rate_limiter.check(scope, key, per_minute, burst)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+
+async def _rate_limit_async(scope: str, key: str, per_minute: int, burst: int) -> None:
+    if rate_limiter.blocking:
+        await run_in_threadpool(_rate_limit, scope, key, per_minute, burst)
+    else:
+        _rate_limit(scope, key, per_minute, burst)
+
+
+def _begin_attempt(
+    db: Session, challenge_id: str, type: ChallengeType, user_id: int | None = None
+) -> ChallengeRecord:
+    try:
+        return challenge_store.begin_attempt(db, challenge_id, type, user_id)
+    except ChallengeNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ChallengeForbidden as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except (ChallengeConsumed, ChallengeExpired) as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except ChallengeTooManyTries as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+
+
+def _consume(db: Session, challenge_id: str) -> None:
+    # single use: of two concurrent correct codes only one gets the tokens
+    if not challenge_store.consume(db, challenge_id):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Challenge consumed")
 
 
 def _get_user_by_username(db: Session, username: str) -> User | None:
     return db.query(User).filter(User.username == username).first()
 
 
+def _login_candidate(db: Session, username: str) -> tuple[int, str] | None:
+    user = _get_user_by_username(db, username)
+    # plain values: the rollback expires the instance, and bcrypt must not pin a pool connection
+    candidate = (user.id, user.password_hash) if user else None
+    db.rollback()
+    return candidate
+
+
+def _issue_login_challenge(db: Session, user_id: int) -> ChallengeRecord:
+    challenge = challenge_store.create(db, user_id, ChallengeType.LOGIN, CHALLENGE_TTL_SECONDS)
+    audit(db, action="auth_start", user_id=user_id, detail="MFA challenge issued")
+    return challenge
+
+
 @router.post("/v1/auth/start", response_model=AuthStartResponse)
-def auth_start(payload: AuthStartRequest, db: Session = Depends(get_db)) -> AuthStartResponse:
-    user = _get_user_by_username(db, payload.username)
-    if not user or not security.verify_password(payload.password, user.password_hash):
+async def auth_start(
+    payload: AuthStartRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)
+) -> AuthStartResponse:
+    # DB steps run on the request threadpool like sync routes do, never on the background
+    # executor: a login burst must not queue the revoker or the leader's lease renewal
+    # before any DB or bcrypt work
+    await _rate_limit_async("auth_ip", ip, settings.auth_ip_rate_per_minute, settings.auth_ip_burst)
+    # keyed with the IP too: otherwise anyone could keep a user locked out by guessing wrong passwords
+    user_key = f"{payload.username.lower()}|{ip}"
+    await _rate_limit_async("auth_user", user_key, settings.auth_user_rate_per_minute, settings.auth_user_burst)
+    candidate = await run_in_threadpool(_login_candidate, db, payload.username)
+    try:
+        # awaited in the loop: a login waiting for a bcrypt worker holds no thread
+        valid = bool(candidate) and await password_pool.verify_async(payload.password, candidate[1])
+    except PasswordPoolSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"}
+        )
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    now = datetime.now(timezone.utc)
-    challenge = Challenge(
-        user_id=user.id,
-        type=ChallengeType.LOGIN,
-        expires_at=now + timedelta(seconds=CHALLENGE_TTL_SECONDS),
-    )
-    db.add(challenge)
-    db.commit()
-    audit(db, action="auth_start", user_id=user.id, detail="MFA challenge issued")
+    challenge = await run_in_threadpool(_issue_login_challenge, db, candidate[0])
 
     return AuthStartResponse(
         challenge_id=challenge.id,
@@ -55,34 +122,21 @@ def auth_start(payload: AuthStartRequest, db: Session = Depends(get_db)) -> Auth
 
 
 @router.post("/v1/auth/verify-mfa", response_model=VerifyMfaResponse)
-def verify_mfa(payload: VerifyMfaRequest, db: Session = Depends(get_db)) -> VerifyMfaResponse:
-    challenge: Challenge | None = db.query(Challenge).filter(Challenge.id == payload.challenge_id).first()
-    if not challenge or challenge.type != ChallengeType.LOGIN:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Challenge not found")
-    if challenge.consumed:
-        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Challenge consumed")
-
-    now = datetime.now(timezone.utc)
-    expires_at = _ensure_aware(challenge.expires_at)
-    if expires_at <= now:
-        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Challenge expired")
+def verify_mfa(
+    payload: VerifyMfaRequest, ip: str = Depends(client_ip), db: Session = Depends(get_db)
+) -> VerifyMfaResponse:
+    # per IP only: guessing is bounded per challenge by CHALLENGE_MAX_TRIES, which both stores
+    # enforce atomically (one conditional UPDATE / under a lock), so parallel requests can't exceed it
+    _rate_limit("mfa_ip", ip, settings.auth_ip_rate_per_minute, settings.auth_ip_burst)
+    challenge = _begin_attempt(db, payload.challenge_id, ChallengeType.LOGIN)
 
     user: User | None = db.query(User).filter(User.id == challenge.user_id).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    if challenge.tries >= 5:
-        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many tries, challenge expired")
-
     if not security.verify_totp(payload.totp_code, user.mfa_secret):
-        challenge.tries += 1
-        db.add(challenge)
-        db.commit()
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid MFA")
-
-    challenge.consumed = True
-    db.add(challenge)
-    db.commit()
+    _consume(db, challenge.id)
 
     access_token = security.create_access_token(user.id)
     proof_token = security.create_proof_token(user.id)
@@ -98,17 +152,10 @@ def verify_mfa(payload: VerifyMfaRequest, db: Session = Depends(get_db)) -> Veri
 
 @router.post("/v1/auth/step-up/start", response_model=StepUpStartResponse)
 def auth_stepup(
-        user: User = Depends(get_current_user),
+        user: Principal = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    now = datetime.now(timezone.utc)
-    challenge = Challenge(
-        user_id=user.id,
-        type=ChallengeType.STEPUP,
-        expires_at=now + timedelta(seconds=CHALLENGE_TTL_SECONDS),
-    )
-    db.add(challenge)
-    db.commit()
+    challenge = challenge_store.create(db, user.id, ChallengeType.STEPUP, CHALLENGE_TTL_SECONDS)
     audit(db, action="stepup_start", user_id=user.id, detail="Step-up MFA challenge issued")
 
     return StepUpStartResponse(
@@ -119,35 +166,20 @@ def auth_stepup(
 @router.post("/v1/auth/step-up/verify", response_model=StepUpVerifyResponse)
 def verify_stepup(
         payload: VerifyMfaRequest,
-        user: User = Depends(get_current_user),
+        principal: Principal = Depends(get_current_user),
         db: Session = Depends(get_db),
 ):
-    challenge: Challenge | None = db.query(Challenge).filter(Challenge.id == payload.challenge_id).first()
-    if not challenge or challenge.type != ChallengeType.STEPUP:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Challenge not found")
-    if challenge.consumed:
-        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Challenge consumed")
-
-    now = datetime.now(timezone.utc)
-    expires_at = _ensure_aware(challenge.expires_at)
-    if expires_at <= now:
-        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Challenge expired")
+    # ownership is checked before a try is counted: nobody can burn another user's tries
+    challenge = _begin_attempt(db, payload.challenge_id, ChallengeType.STEPUP, principal.id)
 
-    if user.id != challenge.user_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Challenge not authorized")
-
-    if challenge.tries >= 5:
-        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many tries, challenge expired")
+    # the principal carries no MFA secret, step-up needs the row itself
+    user: User | None = db.get(User, principal.id)
+    if not user or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not allowed")
 
     if not security.verify_totp(payload.totp_code, user.mfa_secret):
-        challenge.tries += 1
-        db.add(challenge)
-        db.commit()
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid MFA")
-
-    challenge.consumed = True
-    db.add(challenge)
-    db.commit()
+    _consume(db, challenge.id)
 
     proof_token = security.create_proof_token(user.id)
 
@@ -1,9 +1,17 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics import render_metrics
+from app.services.wireguard import wgctl_breaker
 
 router = APIRouter()
 
 
 @router.get("/health")
 def health() -> dict[str, str]:
-    return {"status": "ok"}
+    return {"status": "ok", "wgctl_circuit": wgctl_breaker.state}
+
 
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return render_metrics()
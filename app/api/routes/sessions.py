@@ -7,7 +7,6 @@ from app.api.deps import get_current_user, get_db, get_current_proofed_user
 from app.config import settings
 from app.models import IpPool as IPModel
 from app.models.session import Session as SessionModel, SessionStatus
-from app.models.user import User
 from app.schemas.session import (
     RenewVerifyResponse,
     SessionConfigResponse,
@@ -19,8 +18,11 @@ from app.schemas.session import (
     WgPeer,
 )
 from app.services.audit import audit
-from app.services.ip_alloc import allocate_ip, IpPoolExhausted, quarantine_session
-from app.services.wireguard import wireguard_service
+from app.services.ip_alloc import allocate_ip, host_prefix, IpPoolExhausted, quarantine_sessions
+from app.services.principal_cache import Principal
+from app.services.revoker import expiry_deadlines
+from app.services.stats import session_status_changed
+from app.services.wg_outbox import enqueue_peer_op
 
 CHALLENGE_TTL_SECONDS = 120
 
@@ -41,13 +43,16 @@ def _expire_if_needed(db: Session, sess: SessionModel) -> SessionModel:
         sess.status = SessionStatus.EXPIRED
         sess.updated_at = now
         db.add(sess)
+        session_status_changed(db, SessionStatus.ACTIVE, SessionStatus.EXPIRED)
+        quarantine_sessions(db, [sess.id])
+        enqueue_peer_op(db, "remove", sess.id, sess.client_pubkey)
         db.commit()
-        wireguard_service.remove_peer(sess.id, sess.client_pubkey)
+        expiry_deadlines.discard(sess.id)
         audit(db, action="session_expired", user_id=sess.user_id, session_id=sess.id, detail="On-access check")
     return sess
 
 
-def _validate_owner(sess: SessionModel, user: User) -> None:
+def _validate_owner(sess: SessionModel, user: Principal) -> None:
     if sess.user_id != user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not owner")
 
@@ -55,7 +60,7 @@ def _validate_owner(sess: SessionModel, user: User) -> None:
 def _allocate_address(db: Session, session_id: str) -> str:
     try:
         allocated_ip = allocate_ip(db, session_id)
-        return f"{allocated_ip}/32"
+        return host_prefix(allocated_ip)
     except IpPoolExhausted as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
@@ -63,7 +68,7 @@ def _allocate_address(db: Session, session_id: str) -> str:
 @router.post("/v1/sessions", response_model=SessionCreateResponse)
 def create_session(
     payload: SessionCreateRequest,
-    user: User = Depends(get_current_proofed_user),
+    user: Principal = Depends(get_current_proofed_user),
     db: Session = Depends(get_db),
 ) -> SessionCreateResponse:
     active = (
@@ -97,10 +102,14 @@ def create_session(
         updated_at=now,
     )
     db.add(sess)
-    db.commit()
+    db.flush()
+    session_status_changed(db, None, SessionStatus.ACTIVE)
 
+    # сессия, адрес и добавление пира коммитятся вместе
     allowed_ips = _allocate_address(db, sess.id)
-    wireguard_service.add_peer(sess.id, payload.client_pubkey, allowed_ips)
+    enqueue_peer_op(db, "add", sess.id, payload.client_pubkey, allowed_ips)
+    db.commit()
+    expiry_deadlines.schedule(sess.id, expires_at)
     audit(db, action="session_created", user_id=user.id, session_id=sess.id, detail="Created session. Allocated IPs: " + allowed_ips)
 
     return SessionCreateResponse(
@@ -115,7 +124,7 @@ def create_session(
 @router.get("/v1/sessions/{session_id}", response_model=SessionStatusResponse)
 def session_status(
     session_id: str = Path(...),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> SessionStatusResponse:
     sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
@@ -139,7 +148,7 @@ def session_status(
 @router.post("/v1/sessions/{session_id}/revoke", response_model=SessionRevokeResponse)
 def revoke_session(
     session_id: str,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> SessionRevokeResponse:
     sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
@@ -155,10 +164,12 @@ def revoke_session(
     sess.status = SessionStatus.REVOKED
     sess.updated_at = now
     db.add(sess)
+    session_status_changed(db, SessionStatus.ACTIVE, SessionStatus.REVOKED)
+    quarantine_sessions(db, [sess.id])
+    enqueue_peer_op(db, "remove", sess.id, sess.client_pubkey)
     db.commit()
+    expiry_deadlines.discard(sess.id)
 
-    wireguard_service.remove_peer(sess.id, sess.client_pubkey)
-    quarantine_session(db, sess.id)
     audit(db, action="session_revoked", user_id=user.id, session_id=sess.id, detail="Manual revoke")
 
     return SessionRevokeResponse(status=sess.status.value, revoked_at=now)
@@ -167,7 +178,7 @@ def revoke_session(
 @router.post("/v1/sessions/{session_id}/renew", response_model=RenewVerifyResponse)
 def renew_verify(
     session_id: str,
-    user: User = Depends(get_current_proofed_user),
+    user: Principal = Depends(get_current_proofed_user),
     db: Session = Depends(get_db),
 ) -> RenewVerifyResponse:
     now = datetime.now(timezone.utc)
@@ -191,6 +202,7 @@ def renew_verify(
     sess.updated_at = now
     db.add(sess)
     db.commit()
+    expiry_deadlines.schedule(sess.id, new_expires)
 
     audit(db, action="session_renewed", user_id=user.id, session_id=sess.id)
     return RenewVerifyResponse(
@@ -203,7 +215,7 @@ def renew_verify(
 @router.post("/v1/sessions/{session_id}/config", response_model=SessionConfigResponse)
 def session_config(
     session_id: str,
-    user: User = Depends(get_current_proofed_user),
+    user: Principal = Depends(get_current_proofed_user),
     db: Session = Depends(get_db),
 ) -> SessionConfigResponse:
     sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
@@ -0,0 +1,27 @@
+import argparse
+import logging
+
+from app.db import SessionLocal
+from app.services.ip_pool_init import sync_ip_pool
+
+logging.basicConfig(level=logging.INFO)
+
+
+def _resync_ip_pool(_args: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        sync_ip_pool(db, force=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    resync = commands.add_parser("resync-ip-pool", help="Sync ip_pool with the configured CIDR even if unchanged")
+    resync.set_defaults(func=_resync_ip_pool)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -19,6 +19,23 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     access_token_expires_seconds: int = 900
     proof_token_expires_seconds: int = 60
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 32
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: int = 30
+    # memory: opt-in for a single process only; the multi-worker check is best effort
+    challenge_store_backend: Literal["db", "memory"] = "db"
+    challenge_gc_interval_seconds: int = 60
+    challenge_gc_batch_size: int = 1000
+
+    # Rate limiting (auth endpoints)
+    rate_limit_enabled: bool = True
+    rate_limit_backend: Literal["memory", "postgres"] = "memory"
+    rate_limit_trust_forwarded_for: bool = False
+    auth_ip_rate_per_minute: int = 60
+    auth_ip_burst: int = 20
+    auth_user_rate_per_minute: int = 10
+    auth_user_burst: int = 5
 
     # Session control
     ttl_max_seconds: int = 8 * 60 * 60  # 8 hours default
@@ -37,16 +54,61 @@ class Settings(BaseSettings):
     reserved_ips: list[str] = []
     dns: str = "10.0.0.1"
     network_cidr: str = "10.0.0.0/24"
+    # rows: one ip_pool row per address; sparse: only non-FREE addresses are stored
+    # (required for IPv6 and very large IPv4 pools)
+    ip_pool_mode: Literal["rows", "sparse"] = "rows"
+    # >0: every process pre-leases this many addresses to avoid contention on ip_pool
+    ip_lease_block_size: int = 0
+    ip_lease_ttl_seconds: int = 300
 
     # IP Quarantine
     ip_quarantine_duration_seconds: int = 180
 
+    # Background workers
+    revoker_batch_size: int = 500
+    revoker_sweep_interval_seconds: int = 300
+    # deadlines of sessions created/renewed in non-leader processes are polled this often
+    revoker_poll_interval_seconds: float = 1.0
+    leader_check_interval_seconds: int = 5
+    leader_step_down_timeout_seconds: float = 30.0
+    background_max_workers: int = 4
+    reconcile_interval_seconds: int = 60
+
+    # Audit
+    audit_mode: Literal["buffered", "sync"] = "buffered"
+    audit_batch_size: int = 500
+    audit_flush_interval_seconds: float = 1.0
+    audit_max_queue: int = 100_000
+    audit_batch_max_failures: int = 3  # then the batch is written row by row
+    audit_retention_days: int = 365  # 0: keep forever
+    audit_partitions_ahead: int = 2
+    audit_partition_check_interval_seconds: int = 3600
+    audit_partition_lock_timeout_seconds: float = 2.0  # DETACH gives up and retries on the next check
+
+    # Stats (maintained ip_pool / sessions counters)
+    stats_counter_shards: int = 16
+    stats_recount_interval_seconds: int = 600
+    stats_cache_seconds: float = 5.0
+
     # wgctl settings
     wgctl_token: str = "secret-token-change-me"
     wgctl_socket: str = "/run/wgctl/wgctl.sock"
+    wgctl_timeout_seconds: float = 5.0
+    wgctl_max_connections: int = 20
+    wgctl_batch_size: int = 256
+    wgctl_breaker_failure_threshold: int = 5
+    wgctl_breaker_reset_seconds: float = 30.0
+    outbox_batch_size: int = 500
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_retry_max_seconds: int = 60
+    outbox_max_attempts: int = 20
 
     # Admin
     admin_token: str = "admin-token-change-me"
+    admin_page_size_max: int = 1000
+    admin_export_batch_size: int = 2000  # rows fetched per round trip by the streaming exports
+    admin_job_batch_size: int = 500  # sessions per transaction in bulk revoke jobs
+    admin_job_poll_interval_seconds: float = 5.0
 
     def access_token_ttl(self) -> timedelta:
         return timedelta(seconds=self.access_token_expires_seconds)
@@ -6,19 +6,47 @@ from fastapi import FastAPI
 from app.api.router import api_router
 from app.config import settings
 from app.db import SessionLocal, engine
-from app.models import audit, challenge, session as session_model, user  # noqa: F401
+from app.models import admin_job, audit, challenge, rate_limit, session as session_model, stats, user, wg_outbox  # noqa: F401
 from app.models.base import Base
 from app.models.user import User
+from app.services.admin_jobs import admin_job_runner
+from app.services.audit import audit_writer
+from app.services.audit_partitions import create_audit_partition_manager, ensure_partitions
+from app.services.background import LoopLagMonitor, run_blocking, shutdown_executor
+from app.services.challenge_store import create_challenge_collector
+from app.services.ip_alloc import ip_leases
 from app.services.ip_pool_init import sync_ip_pool
+from app.services.leader import LeaderElector
+from app.services.password_pool import password_pool
 from app.services.qurantine import create_quarantine_releaser
+from app.services.reconciler import create_reconciler
 from app.services.revoker import create_revoker
 from app.services.security import hash_password
+from app.services.stats import create_stats_recounter
+from app.services.wg_outbox import outbox_dispatcher
+from app.services.wireguard import async_wireguard_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 revoker = create_revoker()
 quarantine_releaser = create_quarantine_releaser()
+reconciler = create_reconciler()
+challenge_collector = create_challenge_collector()
+audit_partition_manager = create_audit_partition_manager()
+stats_recounter = create_stats_recounter()
+leader = LeaderElector(
+    workers=[
+        revoker,
+        quarantine_releaser,
+        reconciler,
+        challenge_collector,
+        audit_partition_manager,
+        admin_job_runner,
+        stats_recounter,
+    ]
+)
+loop_lag_monitor = LoopLagMonitor()
 
 
 def _seed_default_user() -> None:
@@ -45,14 +73,27 @@ def create_app() -> FastAPI:
         Base.metadata.create_all(bind=engine)
         with SessionLocal() as db:
             sync_ip_pool(db)
+            # audit() must have a partition to write to before the first request
+            ensure_partitions(db)
         if settings.seed_default_user: _seed_default_user()
-        revoker.start()
-        quarantine_releaser.start()
+        password_pool.start()
+        audit_writer.start()
+        loop_lag_monitor.start()
+        # every process drains the outbox; the advisory lock keeps one dispatcher active at a time
+        outbox_dispatcher.start()
+        leader.start()
 
     @app.on_event("shutdown")
     async def shutdown() -> None:  # pragma: no cover - wiring
-        await revoker.stop()
-        await quarantine_releaser.stop()
+        await leader.stop()
+        await outbox_dispatcher.stop()
+        await audit_writer.stop()
+        await loop_lag_monitor.stop()
+        if settings.ip_lease_block_size > 0:
+            await run_blocking(ip_leases.release)
+        await async_wireguard_service.aclose()
+        await run_blocking(password_pool.shutdown)
+        shutdown_executor()
 
     return app
 
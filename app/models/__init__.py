@@ -3,5 +3,10 @@ from .session import Session
 from .challenge import Challenge
 from .ip_pool import IpPool
 from .audit import AuditLog
+from .service_state import ServiceState
+from .wg_outbox import WgOutbox
+from .rate_limit import RateLimitBucket
+from .admin_job import AdminJob
+from .stats import StatsCounter
 
-__all__ = ["User", "Session", "Challenge", "IpPool", "AuditLog"]
+__all__ = ["User", "Session", "Challenge", "IpPool", "AuditLog", "ServiceState", "WgOutbox", "RateLimitBucket", "AdminJob", "StatsCounter"]
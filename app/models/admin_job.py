@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime, timezone
+from enum import Enum
+from sqlalchemy import Column, DateTime, Enum as SAEnum, Index, Integer, String, Text
+
+from app.models.base import Base
+
+
+class AdminJobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class AdminJob(Base):
+    """Long-running admin operation (e.g. a bulk revoke), executed by the leader in chunks."""
+
+    __tablename__ = "admin_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    status = Column(SAEnum(AdminJobStatus), default=AdminJobStatus.PENDING, nullable=False)
+    params = Column(Text, nullable=False)  # JSON
+    total = Column(Integer, nullable=True)  # estimate taken when the job starts
+    processed = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        # runner poll: "PENDING/RUNNING, oldest first"
+        Index("ix_admin_jobs_status_created_at", "status", "created_at"),
+    )
@@ -1,15 +1,30 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Column, DateTime, Index, Integer, Sequence, String
 
 from app.models.base import Base
 
+AUDIT_ID_SEQ = Sequence("audit_logs_id_seq")
+
 
 class AuditLog(Base):
+    """Range-partitioned by month on ``occurred_at`` (see app.services.audit_partitions)."""
+
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # keyset pagination walks (occurred_at, id); the filtered variants lead with the filter column
+        Index("ix_audit_logs_occurred_at_id", "occurred_at", "id"),
+        Index("ix_audit_logs_user_id_occurred_at_id", "user_id", "occurred_at", "id"),
+        Index("ix_audit_logs_session_id_occurred_at_id", "session_id", "occurred_at", "id"),
+        Index("ix_audit_logs_action_occurred_at_id", "action", "occurred_at", "id"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    occurred_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
-    user_id = Column(Integer, nullable=True, index=True)
-    session_id = Column(String, nullable=True, index=True)
+    # the partition key has to be part of the primary key
+    id = Column(Integer, AUDIT_ID_SEQ, primary_key=True, server_default=AUDIT_ID_SEQ.next_value())
+    occurred_at = Column(
+        DateTime(timezone=True), primary_key=True, default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+    user_id = Column(Integer, nullable=True)
+    session_id = Column(String, nullable=True)
     action = Column(String, nullable=False)
     detail = Column(String, nullable=True)
@@ -21,6 +21,6 @@ class Challenge(Base):
     type = Column(SAEnum(ChallengeType), nullable=False)
     tries = Column(Integer, nullable=False, default=0)
 
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     consumed = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -11,6 +11,8 @@ class IpState(str, enum.Enum):
     FREE = "FREE"
     ASSIGNED = "ASSIGNED"
     QUARANTINED = "QUARANTINED"
+    RESERVED = "RESERVED"  # only materialized in sparse pool mode
+    LEASED = "LEASED"  # pre-leased by one API process, see ip_lease_block_size
 
 
 class IpPool(Base):
@@ -21,6 +23,8 @@ class IpPool(Base):
     session_id = Column(String, ForeignKey("sessions.id"), nullable=True, index=True)
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     quarantined_until = Column(DateTime(timezone=True), nullable=True, index=True)
+    lease_owner = Column(String, nullable=True, index=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
 
     __table_args__ = (
         # полезно для запросов "дай FREE" + сортировка
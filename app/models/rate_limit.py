@@ -0,0 +1,16 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, String
+from sqlalchemy.sql import func
+
+from app.models.base import Base
+
+
+class RateLimitBucket(Base):
+    """Shared token bucket (WG_RATE_LIMIT_BACKEND=postgres); UNLOGGED: losing it on a crash only refills buckets."""
+
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    allowed = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.sql import func
+
+from app.models.base import Base
+
+
+class ServiceState(Base):
+    """Small key/value store for service-wide bookkeeping (e.g. the synced ip_pool fingerprint)."""
+
+    __tablename__ = "service_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
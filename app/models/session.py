@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 from enum import Enum
-from sqlalchemy import Column, DateTime, Enum as SAEnum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum as SAEnum, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -17,7 +17,7 @@ class Session(Base):
     __tablename__ = "sessions"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     status = Column(SAEnum(SessionStatus), default=SessionStatus.ACTIVE, nullable=False)
 
     started_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -31,3 +31,13 @@ class Session(Base):
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
     user = relationship("User")
+
+    __table_args__ = (
+        # expiry sweeps: "ACTIVE and expires_at <= now"
+        Index("ix_sessions_status_expires_at", "status", "expires_at"),
+        # admin listing: keyset on (started_at, id), optionally narrowed by user or status;
+        # the user_id variant also serves the per-user lookups
+        Index("ix_sessions_started_at_id", "started_at", "id"),
+        Index("ix_sessions_user_id_started_at_id", "user_id", "started_at", "id"),
+        Index("ix_sessions_status_started_at_id", "status", "started_at", "id"),
+    )
@@ -0,0 +1,13 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+
+from app.models.base import Base
+
+
+class StatsCounter(Base):
+    """One shard of a maintained count (e.g. ``ip_pool.FREE``); the value is the sum over all shards."""
+
+    __tablename__ = "stats_counters"
+
+    name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
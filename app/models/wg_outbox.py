@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.models.base import Base
+
+
+class WgOutbox(Base):
+    """Pending wgctl peer operation, written in the same transaction as the session change."""
+
+    __tablename__ = "wg_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    op = Column(String, nullable=False)  # add / remove
+    session_id = Column(String, nullable=True)
+    pubkey = Column(String, nullable=False, index=True)
+    allowed_ips = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        Index("ix_wg_outbox_next_attempt_at_id", "next_attempt_at", "id"),
+    )
@@ -1,5 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+BULK_REVOKE_MAX_IDS = 10_000
 
 
 class AdminSessionView(BaseModel):
@@ -16,3 +18,33 @@ class AuditEntry(BaseModel):
     session_id: str | None
     action: str
     detail: str | None
+
+
+class BulkRevokeRequest(BaseModel):
+    """ACTIVE sessions matching every given criterion are revoked; ``all`` must be set to match everything."""
+
+    user_id: int | None = None
+    session_ids: list[str] | None = Field(default=None, max_length=BULK_REVOKE_MAX_IDS)
+    since: datetime | None = None  # started_at, inclusive
+    until: datetime | None = None  # started_at, exclusive
+    all: bool = False
+
+
+class AdminJobView(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    total: int | None
+    processed: int
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+
+class AdminStatsView(BaseModel):
+    ip_pool: dict[str, int]
+    sessions: dict[str, int]
+    pool_usable: int  # every address except RESERVED
+    pool_utilization: float  # ASSIGNED / usable
+    as_of: datetime
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal, engine
+from app.models.admin_job import AdminJob, AdminJobStatus
+from app.models.session import Session as SessionModel, SessionStatus
+from app.services.audit import audit_many
+from app.services.background import run_blocking
+from app.services.ip_alloc import quarantine_sessions
+from app.services.metrics import Counter
+from app.services.stats import session_status_changed
+from app.services.wg_outbox import enqueue_peer_ops
+from app.services.wireguard import PeerOp
+
+logger = logging.getLogger(__name__)
+
+ADMIN_JOBS = Counter("wg_admin_jobs_total", "Finished admin jobs", ["kind", "result"])
+BULK_REVOKED = Counter("wg_admin_bulk_revoked_sessions_total", "Sessions revoked by bulk revoke jobs")
+
+JOB_BULK_REVOKE = "bulk_revoke"
+
+
+class JobInterrupted(Exception):
+    """The runner was stopped between chunks; the job stays RUNNING for the next leader."""
+
+
+def create_job(db: Session, kind: str, params: dict) -> AdminJob:
+    """Queue a job for the leader's runner; commits."""
+    job = AdminJob(kind=kind, params=json.dumps(params, default=str))
+    db.add(job)
+    db.commit()
+    # in the leader process this starts it right away, elsewhere the next poll picks it up
+    admin_job_runner.wake()
+    return job
+
+
+def _revoke_filters(params: dict) -> list:
+    filters = [SessionModel.status == SessionStatus.ACTIVE]
+    if params.get("user_id") is not None:
+        filters.append(SessionModel.user_id == params["user_id"])
+    if params.get("session_ids"):
+        filters.append(SessionModel.id.in_(params["session_ids"]))
+    if params.get("since"):
+        filters.append(SessionModel.started_at >= datetime.fromisoformat(params["since"]))
+    if params.get("until"):
+        filters.append(SessionModel.started_at < datetime.fromisoformat(params["until"]))
+    return filters
+
+
+def _revoke_chunk(db: Session, job: AdminJob, filters: list, limit: int) -> int:
+    """Revoke up to ``limit`` matching sessions in a single transaction.
+
+    Same shape as the revoker's expiry chunk: one UPDATE, one quarantine
+    statement, one outbox insert and one audit insert, then one commit that
+    also records the job's progress.
+    """
+    now = datetime.now(timezone.utc)
+    # no SKIP LOCKED: a session held by a concurrent request is waited for, not left ACTIVE
+    batch = select(SessionModel.id).where(*filters).order_by(SessionModel.id).limit(limit).with_for_update()
+    revoked = db.execute(
+        update(SessionModel)
+        .where(SessionModel.id.in_(batch))
+        .values(status=SessionStatus.REVOKED, updated_at=now)
+        .returning(SessionModel.id, SessionModel.user_id, SessionModel.client_pubkey)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not revoked:
+        db.rollback()
+        return 0
+
+    session_status_changed(db, SessionStatus.ACTIVE, SessionStatus.REVOKED, len(revoked))
+    quarantine_sessions(db, [session_id for session_id, _, _ in revoked])
+    enqueue_peer_ops(db, [PeerOp("remove", session_id, client_pubkey) for session_id, _, client_pubkey in revoked])
+    audit_many(
+        db,
+        [
+            {"action": "admin_revoke", "user_id": user_id, "session_id": session_id, "detail": f"Bulk job {job.id}"}
+            for session_id, user_id, _ in revoked
+        ],
+    )
+    # increment in SQL: after a leader change the old runner may still be finishing its chunk
+    db.execute(
+        update(AdminJob)
+        .where(AdminJob.id == job.id)
+        .values(processed=AdminJob.processed + len(revoked), updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    BULK_REVOKED.inc(len(revoked))
+    return len(revoked)
+
+
+def _run_bulk_revoke(db: Session, job: AdminJob, stop: threading.Event | None = None) -> None:
+    filters = _revoke_filters(json.loads(job.params))
+    if job.total is None:
+        job.total = db.execute(select(func.count()).select_from(SessionModel).where(*filters)).scalar()
+        db.commit()
+    batch_size = settings.admin_job_batch_size
+    while True:
+        # a leader stepping down finishes at most the chunk it is in
+        if stop is not None and stop.is_set():
+            raise JobInterrupted(f"Job {job.id} stopped after {job.processed}/{job.total}")
+        started = time.monotonic()
+        revoked = _revoke_chunk(db, job, filters, batch_size)
+        if revoked:
+            logger.info(
+                "Job %s: revoked %d sessions in %.3fs (%d/%s)",
+                job.id, revoked, time.monotonic() - started, job.processed, job.total,
+            )
+        # a short chunk is not the end: rows that changed while the chunk waited for their
+        # locks drop out of it, so only an empty chunk says nothing matching is left
+        if not revoked:
+            break
+
+
+_HANDLERS = {JOB_BULK_REVOKE: _run_bulk_revoke}
+
+
+@contextmanager
+def _claim(job_id: str) -> Iterator[bool]:
+    """Hold a session-level advisory lock on the job for as long as it runs; yields False if taken.
+
+    The job row itself cannot stay locked: every chunk updates its progress. The
+    lock lives on a dedicated connection, like the leader lock, so it dies with a
+    crashed runner and the job is taken over; while an old leader is still in its
+    last chunk, the new one skips the job instead of running it next to it.
+    """
+    key = {"k": f"{settings.project_name}:admin-job:{job_id}"}
+    conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    claimed = False
+    try:
+        claimed = bool(conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:k))"), key).scalar())
+        yield claimed
+    finally:
+        try:
+            if claimed:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext(:k))"), key)
+        except Exception:
+            # the lock dies with the connection; make sure it is not reused from the pool
+            conn.invalidate()
+        conn.close()
+
+
+def run_job(job_id: str, stop: threading.Event | None = None) -> None:
+    """Run one job to the end, or until ``stop`` is set; the caller holds its :func:`_claim`."""
+    with SessionLocal() as db:
+        job = db.get(AdminJob, job_id)
+        if job is None or job.status not in (AdminJobStatus.PENDING, AdminJobStatus.RUNNING):
+            return
+        now = datetime.now(timezone.utc)
+        # RUNNING here means a previous leader died mid-job; chunks are idempotent, so just go on
+        job.status = AdminJobStatus.RUNNING
+        job.started_at = job.started_at or now
+        job.updated_at = now
+        db.commit()
+        try:
+            handler = _HANDLERS.get(job.kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind {job.kind!r}")
+            handler(db, job, stop)
+        except JobInterrupted as e:
+            db.rollback()
+            logger.info("%s, left RUNNING for the next leader", e)
+            return
+        except Exception as e:
+            db.rollback()
+            logger.exception("Admin job %s failed", job.id)
+            job.status = AdminJobStatus.FAILED
+            job.error = str(e)[:500]
+        else:
+            job.status = AdminJobStatus.DONE
+        job.finished_at = job.updated_at = datetime.now(timezone.utc)
+        db.commit()
+        ADMIN_JOBS.inc(kind=job.kind, result=job.status.value.lower())
+
+
+def run_pending_jobs(stop: threading.Event | None = None) -> int:
+    """Run queued jobs one after another, oldest first, until ``stop`` is set; returns how many were run.
+
+    Jobs claimed by another runner are skipped.
+    """
+    ran = 0
+    busy: list[str] = []
+    while stop is None or not stop.is_set():
+        with SessionLocal() as db:
+            job_id = db.execute(
+                select(AdminJob.id)
+                .where(
+                    AdminJob.status.in_((AdminJobStatus.PENDING, AdminJobStatus.RUNNING)),
+                    AdminJob.id.not_in(busy),
+                )
+                .order_by(AdminJob.created_at)
+                .limit(1)
+            ).scalar()
+        if job_id is None:
+            break
+        with _claim(job_id) as claimed:
+            if not claimed:
+                busy.append(job_id)
+                continue
+            run_job(job_id, stop)
+        ran += 1
+    return ran
+
+
+async def _run_loop(
+    stop_event: asyncio.Event, cancel: threading.Event, wakeup: asyncio.Event, poll_interval_seconds: float
+) -> None:
+    while not stop_event.is_set():
+        try:
+            # the job runs in an executor thread, which only sees the thread-safe ``cancel``
+            await run_blocking(run_pending_jobs, cancel)
+        except Exception:
+            logger.exception("Admin job runner failed")
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=poll_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+
+
+class AdminJobRunner:
+    """Leader-only: runs admin_jobs rows; a job created in the leader process wakes it immediately."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        self._cancel = threading.Event()
+        self._wakeup = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def start(self, poll_interval_seconds: float | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._cancel.clear()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(
+            _run_loop(
+                self._stop,
+                self._cancel,
+                self._wakeup,
+                poll_interval_seconds or settings.admin_job_poll_interval_seconds,
+            )
+        )
+
+    def wake(self) -> None:
+        with self._lock:
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def stop(self) -> None:
+        with self._lock:
+            self._loop = None
+        # cancelling the task does not reach a job running in an executor thread
+        self._cancel.set()
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+admin_job_runner = AdminJobRunner()
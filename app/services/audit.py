@@ -1,8 +1,196 @@
-from app.models.audit import AuditLog
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.db import SessionLocal
+from app.models.audit import AuditLog
+from app.services.background import run_blocking
+from app.services.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE = Gauge("wg_audit_queue_depth", "Audit entries waiting for the buffered writer")
+AUDIT_WRITTEN = Counter("wg_audit_entries_total", "Audit entries handled", ["mode"])
+AUDIT_FLUSH = Histogram("wg_audit_flush_seconds", "Duration of one buffered audit flush")
+AUDIT_DROPPED = Counter("wg_audit_entries_dropped_total", "Buffered audit entries the database rejected")
+
 
-def audit(session: Session, action: str, user_id: int | None = None, session_id: str | None = None, detail: str | None = None) -> None:
-    entry = AuditLog(action=action, user_id=user_id, session_id=session_id, detail=detail)
-    session.add(entry)
+def audit(
+    session: Session,
+    action: str,
+    user_id: int | None = None,
+    session_id: str | None = None,
+    detail: str | None = None,
+    durable: bool = False,
+) -> None:
+    """Record an audit entry.
+
+    Buffered by default (``WG_AUDIT_MODE=buffered``): the entry is queued and
+    written with others in one INSERT shortly after. ``durable=True`` writes and
+    commits it through ``session`` before returning. Callers commit their own
+    changes first; this never commits anything else for them in buffered mode.
+    """
+    entry = {
+        "action": action,
+        "user_id": user_id,
+        "session_id": session_id,
+        "detail": detail,
+        "occurred_at": datetime.now(timezone.utc),
+    }
+    if not durable and audit_writer.enqueue(entry):
+        return
+    session.add(AuditLog(**entry))
     session.commit()
+    AUDIT_WRITTEN.inc(mode="sync")
+
+
+def audit_many(session: Session, entries: list[dict]) -> None:
+    """Insert several audit rows with one multi-row INSERT; the caller commits."""
+    if not entries:
+        return
+    session.execute(insert(AuditLog), entries)
+
+
+class AuditWriter:
+    """Queues audit entries in memory and writes them in batches.
+
+    A batch is flushed when ``audit_batch_size`` entries are waiting or every
+    ``audit_flush_interval_seconds``, with one multi-row INSERT and one commit.
+    Entries accepted before :meth:`stop` are flushed on shutdown; a crash loses
+    at most the entries of the last interval, which is why actions that must
+    survive one use ``durable=True``. When the writer is not running (CLI,
+    scripts) :meth:`enqueue` refuses and :func:`audit` writes synchronously.
+
+    A batch that failed ``audit_batch_max_failures`` times in a row is written
+    row by row, each in a savepoint, and the rows the database rejects are
+    logged and dropped, so one bad entry cannot hold back everything after it.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self._session_factory = session_factory
+        self._queue: deque[dict] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # consecutive failed flushes of the batch at the head of the queue; guarded by _flush_lock
+        self._failures = 0
+
+    def enqueue(self, entry: dict) -> bool:
+        with self._lock:
+            if self._loop is None or settings.audit_mode != "buffered":
+                return False
+            if len(self._queue) >= settings.audit_max_queue:
+                # the database is not keeping up; fall back to a synchronous write for this one
+                return False
+            self._queue.append(entry)
+            depth = len(self._queue)
+            loop = self._loop
+        AUDIT_QUEUE.set(depth)
+        if depth == settings.audit_batch_size:
+            loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of entries written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(len(self._queue), settings.audit_batch_size))]
+                if not batch:
+                    break
+                started = time.monotonic()
+                dropped = 0
+                try:
+                    if self._failures >= settings.audit_batch_max_failures:
+                        dropped = self._write_row_by_row(batch)
+                    else:
+                        with self._session_factory() as db:
+                            audit_many(db, batch)
+                            db.commit()
+                except Exception:
+                    self._failures += 1
+                    with self._lock:
+                        # keep the order and retry on the next tick
+                        self._queue.extendleft(reversed(batch))
+                    raise
+                finally:
+                    AUDIT_QUEUE.set(len(self._queue))
+                self._failures = 0
+                AUDIT_FLUSH.observe(time.monotonic() - started)
+                AUDIT_WRITTEN.inc(len(batch) - dropped, mode="buffered")
+                written += len(batch) - dropped
+        return written
+
+    def _write_row_by_row(self, batch: list[dict]) -> int:
+        """Write ``batch`` one savepoint per row; returns how many rejected rows were dropped.
+
+        Only rows the database refuses (bad data, no partition for the date)
+        are dropped; anything else, e.g. the database being down, still fails
+        the whole batch and keeps it queued.
+        """
+        dropped = 0
+        with self._session_factory() as db:
+            for entry in batch:
+                try:
+                    with db.begin_nested():
+                        audit_many(db, [entry])
+                except (DataError, IntegrityError) as e:
+                    logger.error("Dropping audit entry rejected by the database: %r (%s)", entry, e.orig)
+                    dropped += 1
+            db.commit()
+        AUDIT_DROPPED.inc(dropped)
+        return dropped
+
+    def start(self, flush_interval_seconds: float | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(
+            self._flush_loop(flush_interval_seconds or settings.audit_flush_interval_seconds)
+        )
+
+    async def stop(self) -> None:
+        with self._lock:
+            # from here on audit() writes synchronously
+            self._loop = None
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await run_blocking(self.flush)
+        except Exception:
+            logger.exception("Failed to flush %d audit entries on shutdown", len(self._queue))
+
+    async def _flush_loop(self, interval_seconds: float) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_blocking(self.flush)
+            except Exception:
+                logger.exception("Audit flush failed, %d entries queued", len(self._queue))
+
+
+audit_writer = AuditWriter()
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+from app.services.background import run_blocking
+from app.services.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+AUDIT_PARTITIONS = Gauge("wg_audit_partitions", "Monthly audit_logs partitions currently attached")
+AUDIT_DEFAULT_ROWS = Gauge(
+    "wg_audit_default_partition_rows", "Rows in audit_logs_default, i.e. months without a partition (capped)"
+)
+
+# counting stops here: the gauge is an alert signal, not an exact figure
+_DEFAULT_ROWS_CAP = 10_000
+
+PARENT = "audit_logs"
+DEFAULT_PARTITION = "audit_logs_default"
+_PARTITION_NAME = re.compile(r"^audit_logs_p(\d{4})(\d{2})$")
+
+_LIST_PARTITIONS_SQL = text(
+    """
+    SELECT c.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(:parent)
+    """
+)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def _lock(db: Session) -> None:
+    # startup of every process and the leader loop may all get here at once
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:k))"), {"k": f"{settings.project_name}:audit-partitions"})
+
+
+def _is_partitioned(db: Session) -> bool:
+    relkind = db.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:parent)"), {"parent": PARENT}).scalar()
+    return relkind == "p"
+
+
+def _partitions(db: Session) -> dict[str, date]:
+    months = {}
+    for (name,) in db.execute(_LIST_PARTITIONS_SQL, {"parent": PARENT}).all():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return months
+
+
+def ensure_partitions(db: Session, months_ahead: int | None = None) -> int:
+    """Create the default partition and monthly partitions up to ``months_ahead``; commits."""
+    ahead = settings.audit_partitions_ahead if months_ahead is None else months_ahead
+    if not _is_partitioned(db):
+        logger.warning("audit_logs is not partitioned yet, run the alembic migrations")
+        return 0
+    _lock(db)
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    existing = set(_partitions(db))
+    current = month_start(datetime.now(timezone.utc).date())
+    created = 0
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) in existing:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(text(create_partition_sql(month)))
+            created += 1
+        except DBAPIError:
+            # the default partition already holds rows of that month: they stay there
+            logger.exception("Could not create audit partition %s", partition_name(month))
+    db.commit()
+    return created
+
+
+def drop_expired_partitions(db: Session, retention_days: int | None = None) -> list[str]:
+    """Detach and drop monthly partitions that ended before the retention window; commits.
+
+    Dropping a whole partition is a catalog change, not a row-by-row delete.
+    DETACH takes an ACCESS EXCLUSIVE lock on ``audit_logs``; queued behind a
+    long transaction it would block every audit insert, so it waits at most
+    ``audit_partition_lock_timeout_seconds`` and is retried on the next check.
+    (DETACH ... CONCURRENTLY is not allowed while a default partition exists.)
+    """
+    retention = settings.audit_retention_days if retention_days is None else retention_days
+    if retention <= 0:
+        return []
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention)
+    _lock(db)
+    lock_timeout_ms = max(1, int(settings.audit_partition_lock_timeout_seconds * 1000))
+    db.execute(text(f"SET LOCAL lock_timeout = {lock_timeout_ms}"))
+    dropped = []
+    for name, month in sorted(_partitions(db).items(), key=lambda item: item[1]):
+        if add_months(month, 1) > cutoff:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+        except OperationalError as e:
+            logger.warning("Could not lock %s to detach %s, retrying on the next check: %s", PARENT, name, e.orig)
+            break
+        dropped.append(name)
+    db.commit()
+    return dropped
+
+
+def check_default_partition(db: Session) -> int:
+    """Rows that landed in the default partition (up to a cap); logs a warning when there are any.
+
+    They belong to a month whose partition was missing at insert time and are
+    never removed by retention; creating that month's partition later fails
+    until they are moved out by hand.
+    """
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar() is None:
+        return 0
+    rows = db.execute(
+        text(f"SELECT count(*) FROM (SELECT 1 FROM {DEFAULT_PARTITION} LIMIT {_DEFAULT_ROWS_CAP}) AS capped")
+    ).scalar()
+    AUDIT_DEFAULT_ROWS.set(rows)
+    if rows:
+        logger.warning(
+            "%s is not empty (%d rows, counted up to %d): a monthly partition is missing",
+            DEFAULT_PARTITION, rows, _DEFAULT_ROWS_CAP,
+        )
+    return rows
+
+
+def maintain_partitions() -> tuple[int, list[str]]:
+    with SessionLocal() as db:
+        created = ensure_partitions(db)
+        dropped = drop_expired_partitions(db)
+        AUDIT_PARTITIONS.set(len(_partitions(db)))
+        check_default_partition(db)
+    if created or dropped:
+        logger.info("Audit partitions: created %d, dropped %s", created, dropped or "none")
+    return created, dropped
+
+
+async def _maintain_loop(stop_event: asyncio.Event, interval_seconds: int) -> None:
+    while not stop_event.is_set():
+        try:
+            await run_blocking(maintain_partitions)
+        except Exception:
+            logger.exception("Audit partition maintenance failed")
+        await asyncio.sleep(interval_seconds)
+
+
+class AuditPartitionManager:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+
+    def start(self, interval_seconds: int | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(
+            _maintain_loop(self._stop, interval_seconds or settings.audit_partition_check_interval_seconds)
+        )
+
+    async def stop(self) -> None:
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def create_audit_partition_manager() -> AuditPartitionManager:
+    return AuditPartitionManager()
@@ -0,0 +1,92 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.config import settings
+from app.services.metrics import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LOOP_LAG = Gauge("wg_event_loop_lag_seconds", "Most recent event loop scheduling delay")
+LOOP_LAG_HIST = Histogram(
+    "wg_event_loop_lag_seconds_hist",
+    "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+# Background DB sweeps and wgctl calls are blocking (psycopg2, sync httpx);
+# they run here so the event loop keeps serving requests.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.background_max_workers,
+    thread_name_prefix="wg-background",
+)
+
+
+# cancelling the awaiting task does not stop a call that already runs in a thread
+_in_flight: set[Future] = set()
+_in_flight_lock = threading.Lock()
+
+
+def _forget(future: Future) -> None:
+    with _in_flight_lock:
+        _in_flight.discard(future)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    future = _executor.submit(functools.partial(func, *args, **kwargs))
+    with _in_flight_lock:
+        _in_flight.add(future)
+    future.add_done_callback(_forget)
+    return await asyncio.wrap_future(future)
+
+
+async def wait_blocking(timeout_seconds: float) -> bool:
+    """Wait for blocking calls still running in the executor; False if some outlived the timeout."""
+    with _in_flight_lock:
+        pending = list(_in_flight)
+    if not pending:
+        return True
+    _, not_done = await asyncio.wait([asyncio.wrap_future(f) for f in pending], timeout=timeout_seconds)
+    return not not_done
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _lag_loop(stop_event: asyncio.Event, interval_seconds: float) -> None:
+    while not stop_event.is_set():
+        started = time.monotonic()
+        await asyncio.sleep(interval_seconds)
+        lag = max(0.0, time.monotonic() - started - interval_seconds)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HIST.observe(lag)
+        if lag > 1.0:
+            logger.warning("Event loop lagged %.3fs", lag)
+
+
+class LoopLagMonitor:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+
+    def start(self, interval_seconds: float = 0.5) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(_lag_loop(self._stop, interval_seconds))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
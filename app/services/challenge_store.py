@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models.challenge import Challenge, ChallengeType
+from app.services.background import run_blocking
+from app.services.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+CHALLENGE_MAX_TRIES = 5
+
+CHALLENGES_COLLECTED = Counter("wg_challenges_collected_total", "Expired challenges deleted by GC")
+
+
+class ChallengeNotFound(Exception):
+    pass
+
+
+class ChallengeConsumed(Exception):
+    pass
+
+
+class ChallengeExpired(Exception):
+    pass
+
+
+class ChallengeTooManyTries(Exception):
+    pass
+
+
+class ChallengeForbidden(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ChallengeRecord:
+    id: str
+    user_id: int
+    type: ChallengeType
+    expires_at: datetime
+
+
+def _ensure_aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class DbChallengeStore:
+    """Challenges in the ``challenges`` table; every check-and-update is a single UPDATE.
+
+    Expired rows are deleted in batches by :meth:`collect_garbage`; consumed ones
+    go with them once past their TTL.
+    """
+
+    def create(self, db: Session, user_id: int, type: ChallengeType, ttl_seconds: int) -> ChallengeRecord:
+        challenge = Challenge(
+            user_id=user_id,
+            type=type,
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+        )
+        db.add(challenge)
+        db.commit()
+        return ChallengeRecord(challenge.id, challenge.user_id, challenge.type, challenge.expires_at)
+
+    def begin_attempt(
+        self, db: Session, challenge_id: str, type: ChallengeType, user_id: int | None = None
+    ) -> ChallengeRecord:
+        """Use up one try of a live challenge; the 5-tries limit holds under concurrent attempts too.
+
+        With ``user_id`` a challenge of another user is refused before a try is counted.
+        """
+        now = datetime.now(timezone.utc)
+        conditions = [
+            Challenge.id == challenge_id,
+            Challenge.type == type,
+            Challenge.consumed.is_(False),
+            Challenge.expires_at > now,
+            Challenge.tries < CHALLENGE_MAX_TRIES,
+        ]
+        if user_id is not None:
+            conditions.append(Challenge.user_id == user_id)
+        row = db.execute(
+            update(Challenge)
+            .where(*conditions)
+            .values(tries=Challenge.tries + 1)
+            .returning(Challenge.user_id, Challenge.expires_at)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.commit()
+        if row is not None:
+            return ChallengeRecord(challenge_id, row.user_id, type, _ensure_aware(row.expires_at))
+
+        # slow path: only to tell the caller why
+        challenge = db.execute(select(Challenge).where(Challenge.id == challenge_id)).scalar()
+        if challenge is None or challenge.type != type:
+            raise ChallengeNotFound("Challenge not found")
+        if user_id is not None and challenge.user_id != user_id:
+            raise ChallengeForbidden("Challenge not authorized")
+        if challenge.consumed:
+            raise ChallengeConsumed("Challenge consumed")
+        if _ensure_aware(challenge.expires_at) <= now:
+            raise ChallengeExpired("Challenge expired")
+        raise ChallengeTooManyTries("Too many tries, challenge expired")
+
+    def consume(self, db: Session, challenge_id: str) -> bool:
+        consumed = db.execute(
+            update(Challenge)
+            .where(Challenge.id == challenge_id, Challenge.consumed.is_(False))
+            .values(consumed=True)
+            .returning(Challenge.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        db.commit()
+        return consumed is not None
+
+    def collect_garbage(self, batch_size: int) -> int:
+        now = datetime.now(timezone.utc)
+        total = 0
+        with SessionLocal() as db:
+            while True:
+                doomed = (
+                    select(Challenge.id)
+                    # expiry only: served by ix_challenges_expires_at, an OR with consumed was a seq scan
+                    .where(Challenge.expires_at <= now)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                deleted = db.execute(
+                    delete(Challenge).where(Challenge.id.in_(doomed)).execution_options(synchronize_session=False)
+                ).rowcount
+                # short transactions: GC never holds locks that verify-mfa would wait on
+                db.commit()
+                total += deleted
+                if deleted < batch_size:
+                    break
+        return total
+
+
+class _Entry:
+    __slots__ = ("record", "tries", "consumed")
+
+    def __init__(self, record: ChallengeRecord) -> None:
+        self.record = record
+        self.tries = 0
+        self.consumed = False
+
+
+class MemoryChallengeStore:
+    """Process-local challenges with TTL; for single-process deployments only.
+
+    Nothing touches the database. Entries are kept in expiry order (the TTL is
+    the same for every challenge), so dropping expired ones is a pop from the
+    front; consumed entries stay as tombstones until they expire so a replay
+    still gets "consumed".
+    """
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def create(self, db: Session, user_id: int, type: ChallengeType, ttl_seconds: int) -> ChallengeRecord:
+        now = datetime.now(timezone.utc)
+        record = ChallengeRecord(str(uuid.uuid4()), user_id, type, now + timedelta(seconds=ttl_seconds))
+        with self._lock:
+            self._purge_locked(now)
+            self._entries[record.id] = _Entry(record)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return record
+
+    def begin_attempt(
+        self, db: Session, challenge_id: str, type: ChallengeType, user_id: int | None = None
+    ) -> ChallengeRecord:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            entry = self._entries.get(challenge_id)
+            if entry is None or entry.record.type != type:
+                raise ChallengeNotFound("Challenge not found")
+            if user_id is not None and entry.record.user_id != user_id:
+                raise ChallengeForbidden("Challenge not authorized")
+            if entry.consumed:
+                raise ChallengeConsumed("Challenge consumed")
+            if entry.record.expires_at <= now:
+                raise ChallengeExpired("Challenge expired")
+            if entry.tries >= CHALLENGE_MAX_TRIES:
+                raise ChallengeTooManyTries("Too many tries, challenge expired")
+            entry.tries += 1
+            return entry.record
+
+    def consume(self, db: Session, challenge_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(challenge_id)
+            if entry is None or entry.consumed:
+                return False
+            entry.consumed = True
+            return True
+
+    def collect_garbage(self, batch_size: int) -> int:
+        with self._lock:
+            return self._purge_locked(datetime.now(timezone.utc))
+
+    def _purge_locked(self, now: datetime) -> int:
+        purged = 0
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.record.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+            purged += 1
+        return purged
+
+
+def create_challenge_store() -> DbChallengeStore | MemoryChallengeStore:
+    if settings.challenge_store_backend == "memory":
+        # best effort only: WEB_CONCURRENCY is a default that ``uvicorn --workers`` / ``gunicorn -w``
+        # override without setting it, and other replicas are invisible from here
+        workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+        if workers > 1:
+            # a challenge issued by one worker would be "not found" on every other one
+            raise RuntimeError(
+                f"WG_CHALLENGE_STORE_BACKEND=memory needs a single worker process, WEB_CONCURRENCY={workers}"
+            )
+        logger.warning(
+            "MFA challenges are kept in this process only (WG_CHALLENGE_STORE_BACKEND=memory): "
+            "with several workers or replicas logins fail at verify-mfa; use the db backend there"
+        )
+        return MemoryChallengeStore()
+    return DbChallengeStore()
+
+
+challenge_store = create_challenge_store()
+
+
+async def _collect_loop(stop_event: asyncio.Event, interval_seconds: int) -> None:
+    while not stop_event.is_set():
+        try:
+            collected = await run_blocking(challenge_store.collect_garbage, settings.challenge_gc_batch_size)
+            if collected:
+                CHALLENGES_COLLECTED.inc(collected)
+                logger.info("Deleted %d expired or consumed challenges", collected)
+        except Exception:
+            logger.exception("Challenge GC failed")
+        await asyncio.sleep(interval_seconds)
+
+
+class ChallengeCollector:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+
+    def start(self, interval_seconds: int | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(
+            _collect_loop(self._stop, interval_seconds or settings.challenge_gc_interval_seconds)
+        )
+
+    async def stop(self) -> None:
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def create_challenge_collector() -> ChallengeCollector:
+    return ChallengeCollector()
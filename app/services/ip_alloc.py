@@ -1,38 +1,298 @@
+import ipaddress
+import logging
+import random
+import threading
+import time
+from collections import deque
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from typing import Callable
 
-from sqlalchemy import select, func
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.db import SessionLocal
 from app.models.ip_pool import IpPool, IpState
+from app.services.leader import process_identity
+from app.services.stats import free_state, ip_state_changed
+
+logger = logging.getLogger(__name__)
 
 
 class IpPoolExhausted(Exception):
     pass
 
 
-def allocate_ip(db: Session, session_id) -> str:
-    row = (
+IpAddress = ipaddress.IPv4Address | ipaddress.IPv6Address
+
+# sparse mode: how many times to retry when a concurrent allocator takes our candidate
+_SPARSE_CLAIM_ATTEMPTS = 5
+
+# first address >= :lo that has no ip_pool row: either :lo itself or the
+# successor of the first row whose successor is missing
+_NEXT_GAP_SQL = text(
+    """
+    SELECT c.ip FROM (
+        SELECT CAST(:lo AS inet) AS ip
+        UNION ALL
+        (SELECT p.ip + 1 FROM ip_pool p
+          WHERE p.ip >= CAST(:lo AS inet) AND p.ip < CAST(:hi AS inet)
+            AND NOT EXISTS (SELECT 1 FROM ip_pool n WHERE n.ip = p.ip + 1)
+          ORDER BY p.ip
+          LIMIT 1)
+    ) c
+    WHERE NOT EXISTS (SELECT 1 FROM ip_pool x WHERE x.ip = c.ip)
+    ORDER BY c.ip
+    LIMIT 1
+    """
+)
+
+
+@lru_cache(maxsize=8)
+def _pool_network(cidr: str) -> ipaddress.IPv4Network | ipaddress.IPv6Network:
+    return ipaddress.ip_network(cidr, strict=False)
+
+
+def pool_network() -> ipaddress.IPv4Network | ipaddress.IPv6Network:
+    return _pool_network(settings.network_cidr)
+
+
+def pool_bounds() -> tuple[IpAddress, IpAddress]:
+    """First and last assignable address of ``network_cidr`` (same set as ``net.hosts()``)."""
+    net = pool_network()
+    if net.version == 4 and net.prefixlen < 31:
+        return net.network_address + 1, net.broadcast_address - 1
+    if net.version == 6 and net.prefixlen < 127:
+        # hosts() skips the subnet-router anycast address
+        return net.network_address + 1, net.broadcast_address
+    return net.network_address, net.broadcast_address
+
+
+def pool_size() -> int:
+    first, last = pool_bounds()
+    return int(last) - int(first) + 1
+
+
+def host_prefix(ip: str) -> str:
+    """``ip`` as a single-host prefix for WireGuard AllowedIPs."""
+    return f"{ip}/{ipaddress.ip_address(ip).max_prefixlen}"
+
+
+def _random_address(first: IpAddress, last: IpAddress) -> IpAddress:
+    return type(first)(random.randint(int(first), int(last)))
+
+
+def _first_free_from(db: Session, condition) -> IpPool | None:
+    # index seek on ix_ip_pool_state_ip: cost does not depend on the pool size
+    return (
         db.execute(
             select(IpPool)
-            .where(IpPool.state == IpState.FREE)
-            .order_by(func.random())
+            .where(IpPool.state == IpState.FREE, condition)
+            .order_by(IpPool.ip)
             .with_for_update(skip_locked=True)
             .limit(1)
         )
         .scalars()
         .first()
     )
+
+
+def _allocate_row(db: Session, session_id) -> str:
+    # случайная точка старта + первый FREE адрес после неё (с переходом через начало)
+    pivot = str(_random_address(*pool_bounds()))
+    row = _first_free_from(db, IpPool.ip >= pivot) or _first_free_from(db, IpPool.ip < pivot)
     if row is None:
         raise IpPoolExhausted("No free IPs available")
 
     row.state = IpState.ASSIGNED
     row.session_id = session_id
     row.updated_at = func.now()
+    ip_state_changed(db, IpState.FREE, IpState.ASSIGNED)
     return str(row.ip)
 
 
+def _next_gap(db: Session, lo: IpAddress, hi: IpAddress) -> str | None:
+    ip = db.execute(_NEXT_GAP_SQL, {"lo": str(lo), "hi": str(hi)}).scalar()
+    if ip is None or ipaddress.ip_address(str(ip)) > hi:
+        return None
+    return str(ip)
+
+
+def _claim_sparse(db: Session, values: dict) -> str:
+    # FREE адреса не хранятся: свободно всё, для чего нет строки в ip_pool
+    first, last = pool_bounds()
+    for _ in range(_SPARSE_CLAIM_ATTEMPTS):
+        pivot = _random_address(first, last)
+        candidate = _next_gap(db, pivot, last) or _next_gap(db, first, pivot)
+        if candidate is None:
+            raise IpPoolExhausted("No free IPs available")
+        # the primary key makes the claim collision-free without locking a FREE row
+        claimed = db.execute(
+            insert(IpPool)
+            .values(ip=candidate, **values)
+            .on_conflict_do_nothing(index_elements=[IpPool.ip])
+            .returning(IpPool.ip)
+        ).scalar()
+        if claimed is not None:
+            ip_state_changed(db, None, values["state"])
+            return str(claimed)
+    raise IpPoolExhausted("No free IP could be claimed, pool is contended")
+
+
+def _allocate_sparse(db: Session, session_id) -> str:
+    return _claim_sparse(db, {"state": IpState.ASSIGNED, "session_id": session_id})
+
+
+def _lease_block(db: Session, owner: str, expires_at: datetime, count: int) -> list[str]:
+    lease = {"state": IpState.LEASED, "lease_owner": owner, "lease_expires_at": expires_at}
+    if settings.ip_pool_mode == "sparse":
+        leased = []
+        for _ in range(count):
+            try:
+                leased.append(_claim_sparse(db, lease))
+            except IpPoolExhausted:
+                break
+        return leased
+
+    pivot = str(_random_address(*pool_bounds()))
+    leased = []
+    for condition in (IpPool.ip >= pivot, IpPool.ip < pivot):
+        if len(leased) >= count:
+            break
+        free = (
+            select(IpPool.ip)
+            .where(IpPool.state == IpState.FREE, condition)
+            .order_by(IpPool.ip)
+            .limit(count - len(leased))
+            .with_for_update(skip_locked=True)
+        )
+        leased += db.execute(
+            update(IpPool)
+            .where(IpPool.ip.in_(free))
+            .values(**lease, updated_at=func.now())
+            .returning(IpPool.ip)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+    ip_state_changed(db, IpState.FREE, IpState.LEASED, len(leased))
+    return [str(ip) for ip in leased]
+
+
+class IpLeaseCache:
+    """Block of addresses pre-leased by this process (``WG_IP_LEASE_BLOCK_SIZE`` > 0).
+
+    A block is leased in its own short transaction (state LEASED, lease_owner =
+    this process) and then handed out by a primary-key UPDATE that only matches
+    while this process still owns the lease, so there is no SKIP LOCKED scan on
+    the hot path and a lease reclaimed after ``ip_lease_ttl_seconds`` is never
+    handed out twice. Unused leases are returned on shutdown; leases of a dead
+    process are reclaimed by the quarantine releaser once they expire.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, owner: str | None = None) -> None:
+        self._session_factory = session_factory
+        self._owner = owner or process_identity()
+        self._free: deque[tuple[str, float]] = deque()
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+
+    def allocate(self, db: Session, session_id) -> str | None:
+        """Assign a leased address to ``session_id``; None means "allocate directly"."""
+        ip = self._claim_local(db, session_id)
+        if ip is None and self._refill():
+            ip = self._claim_local(db, session_id)
+        return ip
+
+    def release(self) -> int:
+        with self._lock:
+            self._free.clear()
+        with self._session_factory() as db:
+            q = db.query(IpPool).filter(IpPool.state == IpState.LEASED, IpPool.lease_owner == self._owner)
+            if settings.ip_pool_mode == "sparse":
+                released = q.delete(synchronize_session=False)
+            else:
+                released = q.update(
+                    {
+                        IpPool.state: IpState.FREE,
+                        IpPool.lease_owner: None,
+                        IpPool.lease_expires_at: None,
+                        IpPool.updated_at: func.now(),
+                    },
+                    synchronize_session=False,
+                )
+            ip_state_changed(db, IpState.LEASED, free_state(), released)
+            db.commit()
+        if released:
+            logger.info("Returned %d unused leased IPs", released)
+        return released
+
+    def _claim_local(self, db: Session, session_id) -> str | None:
+        while (ip := self._pop()) is not None:
+            claimed = db.execute(
+                update(IpPool)
+                .where(IpPool.ip == ip, IpPool.state == IpState.LEASED, IpPool.lease_owner == self._owner)
+                .values(
+                    state=IpState.ASSIGNED,
+                    session_id=session_id,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    updated_at=func.now(),
+                )
+                .returning(IpPool.ip)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if claimed is not None:
+                ip_state_changed(db, IpState.LEASED, IpState.ASSIGNED)
+                return str(claimed)
+        return None
+
+    def _pop(self) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            while self._free:
+                ip, usable_until = self._free.popleft()
+                if usable_until > now:
+                    return ip
+        return None
+
+    def _refill(self) -> bool:
+        if not self._refill_lock.acquire(blocking=False):
+            # another thread is refilling; this request allocates directly instead of waiting
+            return False
+        try:
+            ttl = settings.ip_lease_ttl_seconds
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+            with self._session_factory() as db:
+                leased = _lease_block(db, self._owner, expires_at, settings.ip_lease_block_size)
+                db.commit()
+            random.shuffle(leased)
+            # stop handing out well before the DB-side lease runs out
+            usable_until = time.monotonic() + ttl * 0.8
+            with self._lock:
+                self._free.extend((ip, usable_until) for ip in leased)
+            return bool(leased)
+        except Exception:
+            logger.exception("Failed to lease an IP block")
+            return False
+        finally:
+            self._refill_lock.release()
+
+
+ip_leases = IpLeaseCache()
+
+
+def allocate_ip(db: Session, session_id) -> str:
+    if settings.ip_lease_block_size > 0:
+        ip = ip_leases.allocate(db, session_id)
+        if ip is not None:
+            return ip
+    if settings.ip_pool_mode == "sparse":
+        return _allocate_sparse(db, session_id)
+    return _allocate_row(db, session_id)
+
+
 def quarantine_ip(db: Session, ip: str) -> None:
     # безопасно: только если этот IP был привязан к этой сессии
     row = db.get(IpPool, ip)
@@ -40,6 +300,7 @@ def quarantine_ip(db: Session, ip: str) -> None:
         return
 
     now = datetime.now(timezone.utc)
+    ip_state_changed(db, row.state, IpState.QUARANTINED)
     row.quarantined_until = now + timedelta(seconds=settings.ip_quarantine_duration_seconds)
     row.state = IpState.QUARANTINED
     row.session_id = None
@@ -53,3 +314,24 @@ def quarantine_session(db: Session, session_id: str) -> None:
     if not row:
         return
     quarantine_ip(db, row.ip)
+
+
+def quarantine_sessions(db: Session, session_ids: list[str]) -> int:
+    """Quarantine the IPs of many sessions in one statement; the caller commits."""
+    if not session_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    result = db.execute(
+        update(IpPool)
+        .where(IpPool.session_id.in_(session_ids))
+        .values(
+            state=IpState.QUARANTINED,
+            session_id=None,
+            quarantined_until=now + timedelta(seconds=settings.ip_quarantine_duration_seconds),
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # session_id is only set on ASSIGNED rows
+    ip_state_changed(db, IpState.ASSIGNED, IpState.QUARANTINED, result.rowcount)
+    return result.rowcount
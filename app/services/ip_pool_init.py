@@ -1,57 +1,229 @@
+import hashlib
 import ipaddress
+import json
 import logging
-from sqlalchemy import text
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.models.ip_pool import IpPool, IpState
+from app.models.service_state import ServiceState
+from app.services.ip_alloc import pool_bounds, pool_network
+from app.services.stats import recount
 
 logger = logging.getLogger(__name__)
 
-def sync_ip_pool(db: Session) -> None:
-    net = ipaddress.ip_network(settings.network_cidr, strict=False)
+FINGERPRINT_KEY = "ip_pool_fingerprint"
+
+# rows mode materializes every address; beyond this sparse mode must be used
+ROWS_MODE_MAX_ADDRESSES = 1 << 20
+# addresses generated per INSERT ... SELECT generate_series statement
+ROWS_INSERT_CHUNK = 1 << 16
+
+
+@contextmanager
+def _timed(phase: str) -> Iterator[None]:
+    started = time.monotonic()
+    yield
+    logger.info("ip_pool sync: %s took %.3fs", phase, time.monotonic() - started)
+
+
+def pool_fingerprint() -> str:
+    """Hash of everything that defines the pool contents."""
+    definition = {
+        "mode": settings.ip_pool_mode,
+        "network": str(pool_network()),
+        "reserved": sorted(str(ipaddress.ip_address(ip)) for ip in settings.reserved_ips),
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode()).hexdigest()
+
+
+def _stored_fingerprint(db: Session) -> str | None:
+    return db.execute(select(ServiceState.value).where(ServiceState.key == FINGERPRINT_KEY)).scalar()
+
+
+def sync_ip_pool(db: Session, force: bool = False) -> bool:
+    """Bring ip_pool in line with the configured pool; returns False if it was already in sync.
+
+    The synced pool definition is recorded as a fingerprint, so restarts with an
+    unchanged config skip the sync without taking the advisory lock. ``force``
+    resyncs regardless (admin endpoint / ``python -m app.cli resync-ip-pool``).
+    """
+    net = pool_network()
     reserved = set(settings.reserved_ips)
+    fingerprint = pool_fingerprint()
+
+    if not force and _stored_fingerprint(db) == fingerprint:
+        db.rollback()
+        logger.info("ip_pool: definition unchanged, sync skipped")
+        return False
+
+    if settings.ip_pool_mode == "rows" and net.num_addresses > ROWS_MODE_MAX_ADDRESSES:
+        raise ValueError(
+            f"network_cidr {settings.network_cidr} is too large for ip_pool_mode=rows; use WG_IP_POOL_MODE=sparse"
+        )
+
+    # advisory lock, чтобы 2 инстанса не синкались одновременно; transaction-level, so the
+    # commit or rollback releases it on the very connection that holds it
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:k))"), {"k": settings.project_name})
+
+    # другой инстанс мог синкнуть, пока мы ждали lock
+    if not force and _stored_fingerprint(db) == fingerprint:
+        db.rollback()
+        logger.info("ip_pool: synced by another instance, sync skipped")
+        return False
 
-    # advisory lock, чтобы 2 инстанса не синкались одновременно
-    db.execute(text("SELECT pg_advisory_lock(hashtext(:k))"), {"k": settings.project_name})
-
-    try:
-        desired = {str(ip) for ip in net.hosts()}
-        desired -= reserved
-
-        # 1) загрузим существующие ip и state
-        rows = db.query(IpPool.ip, IpPool.state).all()
-        existing = {str(ip) for (ip, _) in rows}
-
-        # 2) добавить недостающие
-        to_add = desired - existing
-        if to_add:
-            db.bulk_save_objects([IpPool(ip=ip, state=IpState.FREE) for ip in sorted(to_add)])
-            logger.info("ip_pool: added %d IPs", len(to_add))
-
-        # 3) удалить лишние (ТОЛЬКО FREE/QUARANTINED)
-        # сначала найдём кандидатов вне desired
-        extras = []
-        for ip, st in rows:
-            ip_str = str(ip)
-            if ip_str not in desired:
-                extras.append((ip_str, st))
-
-        deletable = [ip for ip, st in extras if st in (IpState.FREE, IpState.QUARANTINED)]
-        assigned_outside = [ip for ip, st in extras if st == IpState.ASSIGNED]
-
-        if deletable:
-            db.query(IpPool).filter(IpPool.ip.in_(deletable)).delete(synchronize_session=False)
-            logger.info("ip_pool: removed %d IPs (FREE/QUARANTINED) outside CIDR", len(deletable))
-
-        if assigned_outside:
-            # не трогаем, но это важный сигнал
-            logger.warning(
-                "ip_pool: %d ASSIGNED IPs are outside current CIDR; manual action required. examples=%s",
-                len(assigned_outside),
-                assigned_outside[:5],
+    with _timed(f"full sync ({settings.ip_pool_mode}, {settings.network_cidr})"):
+        if settings.ip_pool_mode == "sparse":
+            _sync_sparse(db, reserved)
+        else:
+            _sync_rows(db, reserved)
+        db.execute(
+            insert(ServiceState)
+            .values(key=FINGERPRINT_KEY, value=fingerprint)
+            .on_conflict_do_update(
+                index_elements=[ServiceState.key],
+                set_={"value": fingerprint, "updated_at": text("now()")},
             )
+        )
+        with _timed("commit"):
+            db.commit()
+    # the commit released the lock: the recount is a transaction of its own and never runs under it.
+    # rows were added/removed wholesale: count them instead of tracking deltas
+    with _timed("recount stats"):
+        recount(db)
+    return True
+
+
+def _sync_rows(db: Session, reserved: set[str]) -> None:
+    """Diff the CIDR against ip_pool inside Postgres; nothing is enumerated in Python."""
+    first, last = pool_bounds()
+    bounds = {"first": str(first), "last": str(last), "reserved": sorted(reserved)}
+    total = int(last) - int(first) + 1
+
+    # 1) добавить недостающие: generate_series по CIDR минус существующие строки
+    with _timed("add missing"):
+        added = 0
+        for lo in range(0, total, ROWS_INSERT_CHUNK):
+            added += db.execute(
+                text(
+                    "INSERT INTO ip_pool (ip, state) "
+                    "SELECT c.ip, 'FREE' FROM ("
+                    "    SELECT CAST(:first AS inet) + g AS ip "
+                    "    FROM generate_series(CAST(:lo AS bigint), CAST(:hi AS bigint)) AS g"
+                    ") c "
+                    "WHERE NOT (c.ip = ANY(CAST(:reserved AS inet[]))) "
+                    "AND NOT EXISTS (SELECT 1 FROM ip_pool p WHERE p.ip = c.ip) "
+                    "ON CONFLICT (ip) DO NOTHING"
+                ),
+                {**bounds, "lo": lo, "hi": min(lo + ROWS_INSERT_CHUNK, total) - 1},
+            ).rowcount
+    if added:
+        logger.info("ip_pool: added %d IPs", added)
+
+    # 2) удалить лишние (ТОЛЬКО FREE/QUARANTINED/RESERVED/LEASED) одним запросом
+    with _timed("remove outside"):
+        removed = db.execute(
+            text(
+                "DELETE FROM ip_pool "
+                "WHERE state IN ('FREE', 'QUARANTINED', 'RESERVED', 'LEASED') "
+                "AND (NOT (ip BETWEEN CAST(:first AS inet) AND CAST(:last AS inet)) "
+                "     OR ip = ANY(CAST(:reserved AS inet[])))"
+            ),
+            bounds,
+        ).rowcount
+    if removed:
+        logger.info("ip_pool: removed %d unassigned IPs outside CIDR or reserved", removed)
+
+    # 3) RESERVED строки из sparse-режима: адрес больше не зарезервирован, в rows он FREE
+    with _timed("release reserved"):
+        released = db.execute(
+            text(
+                "UPDATE ip_pool SET state = 'FREE', updated_at = now() "
+                "WHERE state = 'RESERVED' "
+                "AND ip BETWEEN CAST(:first AS inet) AND CAST(:last AS inet) "
+                "AND NOT (ip = ANY(CAST(:reserved AS inet[])))"
+            ),
+            bounds,
+        ).rowcount
+    if released:
+        logger.info("ip_pool: released %d RESERVED IPs no longer reserved", released)
+
+    with _timed("check assigned"):
+        assigned_outside = db.execute(
+            text(
+                "SELECT host(ip) FROM ip_pool WHERE state = 'ASSIGNED' "
+                "AND (NOT (ip BETWEEN CAST(:first AS inet) AND CAST(:last AS inet)) "
+                "     OR ip = ANY(CAST(:reserved AS inet[])))"
+            ),
+            bounds,
+        ).scalars().all()
+    _warn_assigned_outside(assigned_outside)
+
+
+def _sync_sparse(db: Session, reserved: set[str]) -> None:
+    """Sparse mode keeps no FREE rows, so the sync never depends on the pool size."""
+    first, last = pool_bounds()
+    bounds = {"first": str(first), "last": str(last)}
+    in_bounds = [ip for ip in reserved if first <= ipaddress.ip_address(ip) <= last]
+
+    # 1) FREE строки остались от rows-режима — в sparse они не нужны
+    with _timed("drop FREE rows"):
+        dropped = db.execute(text("DELETE FROM ip_pool WHERE state = 'FREE'")).rowcount
+    if dropped:
+        logger.info("ip_pool: dropped %d FREE rows (sparse mode)", dropped)
+
+    # 2) зарезервированные адреса храним строками, чтобы аллокатор их пропускал
+    with _timed("sync reserved"):
+        db.execute(
+            text(
+                "DELETE FROM ip_pool WHERE state = 'RESERVED' "
+                "AND NOT (ip = ANY(CAST(:reserved AS inet[])))"
+            ),
+            {"reserved": in_bounds},
+        )
+        if in_bounds:
+            db.execute(
+                text(
+                    "INSERT INTO ip_pool (ip, state) "
+                    "SELECT CAST(r AS inet), 'RESERVED' FROM unnest(CAST(:reserved AS text[])) AS r "
+                    "ON CONFLICT (ip) DO NOTHING"
+                ),
+                {"reserved": in_bounds},
+            )
+
+    # 3) QUARANTINED/LEASED вне CIDR можно просто удалить
+    with _timed("remove outside"):
+        removed = db.execute(
+            text(
+                "DELETE FROM ip_pool WHERE state IN ('QUARANTINED', 'LEASED') "
+                "AND NOT (ip BETWEEN CAST(:first AS inet) AND CAST(:last AS inet))"
+            ),
+            bounds,
+        ).rowcount
+    if removed:
+        logger.info("ip_pool: removed %d QUARANTINED/LEASED IPs outside CIDR", removed)
+
+    with _timed("check assigned"):
+        assigned_outside = db.execute(
+            text(
+                "SELECT host(ip) FROM ip_pool WHERE state = 'ASSIGNED' "
+                "AND NOT (ip BETWEEN CAST(:first AS inet) AND CAST(:last AS inet))"
+            ),
+            bounds,
+        ).scalars().all()
+    _warn_assigned_outside(assigned_outside)
+
 
-        db.commit()
-    finally:
-        db.execute(text("SELECT pg_advisory_unlock(hashtext(:k))"), {"k": settings.project_name})
+def _warn_assigned_outside(assigned_outside: list[str]) -> None:
+    if assigned_outside:
+        # не трогаем, но это важный сигнал
+        logger.warning(
+            "ip_pool: %d ASSIGNED IPs are outside current CIDR; manual action required. examples=%s",
+            len(assigned_outside),
+            assigned_outside[:5],
+        )
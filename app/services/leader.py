@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+from typing import Protocol
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+from app.db import engine
+from app.services.background import run_blocking, wait_blocking
+from app.services.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+LEADER = Gauge("wg_background_leader", "1 if this process runs the leader-only background workers", ["process"])
+LEADER_CHANGES = Counter("wg_background_leader_changes_total", "Leadership acquisitions and losses", ["process", "event"])
+
+
+def process_identity() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class BackgroundWorker(Protocol):
+    def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class LeaderElector:
+    """Runs ``workers`` in exactly one process across all replicas and uvicorn workers.
+
+    Leadership is a session-level ``pg_try_advisory_lock`` held on a dedicated
+    connection. Postgres drops the lock as soon as that connection dies, so a
+    crashed leader is replaced on the next check of another process; a leader
+    that loses its connection stops its workers on its own next check.
+    """
+
+    def __init__(self, workers: list[BackgroundWorker], lock_name: str | None = None) -> None:
+        self._workers = workers
+        self._lock_name = lock_name or f"{settings.project_name}:background-leader"
+        self._identity = process_identity()
+        self._conn: Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        # _try_acquire runs in a thread that stop() cannot cancel: it publishes the
+        # connection only under this lock, after checking that stop was not requested
+        self._conn_lock = threading.Lock()
+        LEADER.set(0, process=self._identity)
+
+    @property
+    def is_leader(self) -> bool:
+        return self._conn is not None
+
+    def start(self, check_interval_seconds: int | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        interval = check_interval_seconds or settings.leader_check_interval_seconds
+        self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        with self._conn_lock:
+            self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._step_down()
+
+    async def _run(self, interval_seconds: int) -> None:
+        while not self._stop.is_set():
+            if self.is_leader:
+                if not await run_blocking(self._lease_alive):
+                    logger.warning("Lost background leadership: %s", self._identity)
+                    await self._step_down()
+            elif await run_blocking(self._try_acquire):
+                logger.info("Acquired background leadership: %s", self._identity)
+                LEADER.set(1, process=self._identity)
+                LEADER_CHANGES.inc(process=self._identity, event="acquired")
+                for worker in self._workers:
+                    worker.start()
+            await asyncio.sleep(interval_seconds)
+
+    def _try_acquire(self) -> bool:
+        conn = None
+        try:
+            conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:k))"), {"k": self._lock_name}
+            ).scalar()
+        except Exception:
+            logger.exception("Leader election attempt failed")
+            if conn is not None:
+                conn.invalidate()
+                conn.close()
+            return False
+        if not acquired:
+            conn.close()
+            return False
+        with self._conn_lock:
+            if not self._stop.is_set():
+                self._conn = conn
+                return True
+        # stop() was requested: its _step_down may already have found no connection to release
+        self._release(conn)
+        return False
+
+    def _lease_alive(self) -> bool:
+        try:
+            self._conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            logger.exception("Leader lease connection check failed")
+            return False
+
+    def _release(self, conn: Connection) -> None:
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:k))"), {"k": self._lock_name})
+            conn.close()
+        except Exception:
+            # the lock dies with the connection; make sure it is not reused from the pool
+            conn.invalidate()
+            conn.close()
+
+    async def _step_down(self) -> None:
+        if self._conn is None:
+            return
+        for worker in self._workers:
+            await worker.stop()
+        # stopped workers may still have a sweep/job/recount running in an executor thread;
+        # releasing the lock now would let the next leader start the same work next to it
+        if not await wait_blocking(settings.leader_step_down_timeout_seconds):
+            logger.warning(
+                "Blocking background calls still running after %ss, releasing leadership anyway",
+                settings.leader_step_down_timeout_seconds,
+            )
+        conn, self._conn = self._conn, None
+        await run_blocking(self._release, conn)
+        LEADER.set(0, process=self._identity)
+        LEADER_CHANGES.inc(process=self._identity, event="released")
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config import settings
+from app.services import security
+from app.services.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+HASH_IN_FLIGHT = Gauge("wg_password_hash_in_flight", "Password hash/verify calls admitted to the pool", ["state"])
+HASH_LATENCY = Histogram(
+    "wg_password_hash_seconds",
+    "Password hash/verify latency including the wait for a worker",
+    ["op"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+HASH_REJECTED = Counter("wg_password_hash_rejected_total", "Password calls shed because the pool queue was full", ["op"])
+
+
+class PasswordPoolSaturated(Exception):
+    pass
+
+
+class PasswordPool:
+    """Size-bounded process pool for bcrypt.
+
+    bcrypt holds a request thread for the whole hash, so a burst of logins
+    used to take over the anyio threadpool. Here at most
+    ``password_hash_workers`` hashes run at once and at most
+    ``password_hash_queue_limit`` more may wait; anything beyond that raises
+    :class:`PasswordPoolSaturated` right away so the route can answer 503.
+    Async routes use :meth:`verify_async`, which waits without holding a thread.
+    """
+
+    def __init__(self, workers: int, queue_limit: int) -> None:
+        self._workers = workers
+        self._limit = workers + queue_limit
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def start(self) -> None:
+        with self._lock:
+            self._get_executor()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run("verify", security.verify_password, plain_password, hashed_password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run_async("verify", security.verify_password, plain_password, hashed_password)
+
+    def hash(self, plain_password: str) -> str:
+        return self._run("hash", security.hash_password, plain_password)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs threads (uvicorn, SQLAlchemy pool) is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _replace(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+            executor = self._get_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+        return executor
+
+    def _admit(self, op: str) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._in_flight >= self._limit:
+                HASH_REJECTED.inc(op=op)
+                raise PasswordPoolSaturated("Password verification is overloaded, retry later")
+            self._in_flight += 1
+            self._publish_depth()
+            return self._get_executor()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._publish_depth()
+
+    def _publish_depth(self) -> None:
+        HASH_IN_FLIGHT.set(min(self._in_flight, self._workers), state="running")
+        HASH_IN_FLIGHT.set(max(0, self._in_flight - self._workers), state="queued")
+
+    def _run(self, op: str, func, *args):
+        executor = self._admit(op)
+        started = time.monotonic()
+        try:
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                # a worker died (OOM kill etc.): replace the pool once instead of failing every later login
+                logger.error("Password worker pool broke, restarting it")
+                return self._replace(executor).submit(func, *args).result()
+        finally:
+            HASH_LATENCY.observe(time.monotonic() - started, op=op)
+            self._release()
+
+    async def _run_async(self, op: str, func, *args):
+        executor = self._admit(op)
+        started = time.monotonic()
+        try:
+            try:
+                return await asyncio.wrap_future(executor.submit(func, *args))
+            except BrokenProcessPool:
+                logger.error("Password worker pool broke, restarting it")
+                return await asyncio.wrap_future(self._replace(executor).submit(func, *args))
+        finally:
+            HASH_LATENCY.observe(time.monotonic() - started, op=op)
+            self._release()
+
+
+password_pool = PasswordPool(settings.password_hash_workers, settings.password_hash_queue_limit)
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.config import settings
+from app.services.metrics import Counter
+
+PRINCIPAL_CACHE = Counter("wg_principal_cache_requests_total", "Token to principal lookups", ["result"])
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller as seen by routes; load the User row only when more is needed."""
+
+    id: int
+    username: str
+    scope: str  # access / proof
+
+
+class PrincipalCache:
+    """Bounded LRU of verified tokens -> active principal.
+
+    An entry lives for ``ttl_seconds`` at most and never past the token's own
+    ``exp``. Deactivating a user drops its entries in this process; other
+    processes see the change once their entries time out.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[Principal, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Principal | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(token)
+                PRINCIPAL_CACHE.inc(result="hit")
+                return entry[0]
+            if entry is not None:
+                del self._entries[token]
+        PRINCIPAL_CACHE.inc(result="miss")
+        return None
+
+    def put(self, token: str, principal: Principal, token_exp: float) -> None:
+        if self._ttl_seconds <= 0 or self._max_entries <= 0:
+            return
+        deadline = min(time.time() + self._ttl_seconds, token_exp)
+        with self._lock:
+            self._entries[token] = (principal, deadline)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> int:
+        with self._lock:
+            stale = [token for token, (principal, _) in self._entries.items() if principal.id == user_id]
+            for token in stale:
+                del self._entries[token]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(settings.principal_cache_size, settings.principal_cache_ttl_seconds)
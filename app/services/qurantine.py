@@ -4,16 +4,20 @@ from datetime import datetime, timezone
 
 from sqlalchemy import func
 
+from app.config import settings
 from app.db import SessionLocal
+from app.services.background import run_blocking
 from app.models import IpPool
 from app.models.ip_pool import IpState
+from app.services.stats import free_state, ip_state_changed
 
 logger = logging.getLogger(__name__)
 
 async def _release_loop(stop_event: asyncio.Event, interval_seconds: int = 10) -> None:
     while not stop_event.is_set():
         await asyncio.sleep(interval_seconds)
-        _release_quarantine_once()
+        await run_blocking(_release_quarantine_once)
+        await run_blocking(_reclaim_expired_leases_once)
 
 
 def _release_quarantine_once() -> int:
@@ -25,19 +29,52 @@ def _release_quarantine_once() -> int:
             .filter(IpPool.quarantined_until.isnot(None))
             .filter(IpPool.quarantined_until <= now)
         )
-        updated = q.update(
-            {
-                IpPool.state: IpState.FREE,
-                IpPool.quarantined_until: None,
-                IpPool.updated_at: func.now(),
-            },
-            synchronize_session=False,
-        )
+        if settings.ip_pool_mode == "sparse":
+            # в sparse-режиме свободный адрес — это отсутствие строки
+            updated = q.delete(synchronize_session=False)
+        else:
+            updated = q.update(
+                {
+                    IpPool.state: IpState.FREE,
+                    IpPool.quarantined_until: None,
+                    IpPool.updated_at: func.now(),
+                },
+                synchronize_session=False,
+            )
         if updated:
+            ip_state_changed(db, IpState.QUARANTINED, free_state(), updated)
             db.commit()
             logger.info("Automatically released %d IPs from quarantine", updated)
         return updated
 
+def _reclaim_expired_leases_once() -> int:
+    """Free addresses leased by processes that died without returning them."""
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        q = (
+            db.query(IpPool)
+            .filter(IpPool.state == IpState.LEASED)
+            .filter(IpPool.lease_expires_at <= now)
+        )
+        if settings.ip_pool_mode == "sparse":
+            reclaimed = q.delete(synchronize_session=False)
+        else:
+            reclaimed = q.update(
+                {
+                    IpPool.state: IpState.FREE,
+                    IpPool.lease_owner: None,
+                    IpPool.lease_expires_at: None,
+                    IpPool.updated_at: func.now(),
+                },
+                synchronize_session=False,
+            )
+        if reclaimed:
+            ip_state_changed(db, IpState.LEASED, free_state(), reclaimed)
+            db.commit()
+            logger.info("Reclaimed %d expired IP leases", reclaimed)
+        return reclaimed
+
+
 class QuarantineReleaser:
     def __init__(self) -> None:
         self._task: asyncio.Task | None = None
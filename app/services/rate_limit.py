@@ -0,0 +1,120 @@
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import engine
+from app.services.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT = Counter("wg_rate_limit_requests_total", "Rate limiter decisions", ["scope", "result"])
+
+# refill by elapsed time, then take one token if there is one; a single
+# statement, so concurrent replicas never double-spend a token
+_TAKE_SQL = text(
+    """
+    INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at)
+    VALUES (:key, :burst - 1, true, now())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = CASE
+            WHEN LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) >= 1
+            THEN LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) - 1
+            ELSE LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate)
+        END,
+        allowed = LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * :rate) >= 1,
+        updated_at = now()
+    RETURNING allowed, tokens
+    """
+)
+
+# full buckets carry no state: a missing row behaves the same
+_PURGE_SQL = text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :idle)")
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Too many requests")
+        self.retry_after = retry_after
+
+
+class MemoryBuckets:
+    """Token buckets in this process; a bounded LRU, an evicted key simply starts full again."""
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """Take a token; returns 0 when allowed, otherwise seconds until the next token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class PostgresBuckets:
+    """Token buckets shared by all replicas in the UNLOGGED ``rate_limit_buckets`` table.
+
+    Runs on its own autocommit connection, not the request's session. If the
+    database is unavailable the limiter fails open: auth is then limited by
+    the database anyway.
+    """
+
+    def __init__(self, purge_probability: float = 0.001) -> None:
+        self._purge_probability = purge_probability
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                allowed, tokens = conn.execute(_TAKE_SQL, {"key": key, "rate": rate, "burst": burst}).one()
+                if random.random() < self._purge_probability:
+                    conn.execute(_PURGE_SQL, {"idle": 24 * 3600})
+        except Exception:
+            logger.exception("Shared rate limiter unavailable, allowing request")
+            return 0.0
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self, backend: MemoryBuckets | PostgresBuckets) -> None:
+        self._backend = backend
+
+    @property
+    def blocking(self) -> bool:
+        """Whether :meth:`check` does I/O; the memory backend is only a lock and some arithmetic."""
+        return isinstance(self._backend, PostgresBuckets)
+
+    def check(self, scope: str, key: str, per_minute: int, burst: int) -> None:
+        """Raise :class:`RateLimited` when ``key`` has no token left in ``scope``."""
+        if not settings.rate_limit_enabled or per_minute <= 0:
+            return
+        wait = self._backend.take(f"{scope}:{key}", per_minute / 60.0, burst)
+        if wait > 0:
+            RATE_LIMIT.inc(scope=scope, result="rejected")
+            raise RateLimited(wait)
+        RATE_LIMIT.inc(scope=scope, result="allowed")
+
+
+def create_rate_limiter() -> RateLimiter:
+    if settings.rate_limit_backend == "postgres":
+        return RateLimiter(PostgresBuckets())
+    return RateLimiter(MemoryBuckets())
+
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models.ip_pool import IpPool
+from app.models.session import Session as SessionModel, SessionStatus
+from app.services.background import run_blocking
+from app.services.ip_alloc import host_prefix
+from app.services.metrics import Counter, Gauge, Histogram
+from app.services.wireguard import CircuitOpenError, PeerOp, async_wireguard_service
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_DURATION = Histogram("wg_reconcile_duration_seconds", "Duration of one DB-to-WireGuard reconcile pass")
+RECONCILE_DRIFT = Gauge("wg_reconcile_drift", "Peers out of sync found by the last reconcile pass", ["kind"])
+RECONCILE_RUNS = Counter("wg_reconcile_runs_total", "Reconcile passes", ["result"])
+
+
+@dataclass
+class ReconcileReport:
+    desired: int
+    actual: int
+    missing: int
+    mismatched: int
+    stale: int
+    failed: int
+    duration_seconds: float
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _desired_peers() -> dict[str, tuple[str, str]]:
+    """``{pubkey: (session_id, allowed_ips)}`` for every ACTIVE session, in one query."""
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(SessionModel.id, SessionModel.client_pubkey, IpPool.ip)
+            .join(IpPool, IpPool.session_id == SessionModel.id)
+            .where(SessionModel.status == SessionStatus.ACTIVE)
+        ).all()
+    return {pubkey: (session_id, host_prefix(str(ip).split("/")[0])) for session_id, pubkey, ip in rows}
+
+
+def _inactive_pubkeys(pubkeys: list[str]) -> list[str]:
+    with SessionLocal() as db:
+        active = set(
+            db.execute(
+                select(SessionModel.client_pubkey)
+                .where(SessionModel.client_pubkey.in_(pubkeys))
+                .where(SessionModel.status == SessionStatus.ACTIVE)
+            ).scalars()
+        )
+    return [pubkey for pubkey in pubkeys if pubkey not in active]
+
+
+async def reconcile_once() -> ReconcileReport:
+    """Diff wgctl's peers against ACTIVE sessions and apply only the delta.
+
+    The peer list is read before the DB snapshot, so a session created in
+    between is only ever re-added (idempotent). A session revoked after the
+    snapshot could be re-added by mistake, so added peers are re-checked
+    against the DB and removed again if no longer ACTIVE.
+    """
+    started = time.monotonic()
+    actual = await async_wireguard_service.list_peers()
+    desired = await run_blocking(_desired_peers)
+
+    missing = [pubkey for pubkey in desired if pubkey not in actual]
+    mismatched = [pubkey for pubkey in desired if pubkey in actual and actual[pubkey] != desired[pubkey][1]]
+    stale = [pubkey for pubkey in actual if pubkey not in desired]
+
+    if desired and not actual:
+        logger.warning("wgctl reports no peers, restoring %d active sessions", len(desired))
+
+    ops = [PeerOp("add", desired[pubkey][0], pubkey, desired[pubkey][1]) for pubkey in missing + mismatched]
+    ops += [PeerOp("remove", "-", pubkey) for pubkey in stale]
+    results = await async_wireguard_service.apply(ops)
+    failed = sum(1 for result in results if not result.ok)
+
+    added = [result.op.pubkey for result in results if result.ok and result.op.op == "add"]
+    if added:
+        revoked_meanwhile = await run_blocking(_inactive_pubkeys, added)
+        if revoked_meanwhile:
+            await async_wireguard_service.remove_peers([("-", pubkey) for pubkey in revoked_meanwhile])
+
+    report = ReconcileReport(
+        desired=len(desired),
+        actual=len(actual),
+        missing=len(missing),
+        mismatched=len(mismatched),
+        stale=len(stale),
+        failed=failed,
+        duration_seconds=time.monotonic() - started,
+    )
+    RECONCILE_DURATION.observe(report.duration_seconds)
+    RECONCILE_DRIFT.set(report.missing, kind="missing")
+    RECONCILE_DRIFT.set(report.mismatched, kind="mismatched")
+    RECONCILE_DRIFT.set(report.stale, kind="stale")
+    if missing or mismatched or stale:
+        logger.info("Reconciled WireGuard peers: %s", report.as_dict())
+    return report
+
+
+async def _reconcile_loop(stop_event: asyncio.Event, interval_seconds: int) -> None:
+    while not stop_event.is_set():
+        try:
+            await reconcile_once()
+            RECONCILE_RUNS.inc(result="ok")
+        except CircuitOpenError:
+            RECONCILE_RUNS.inc(result="skipped")
+            logger.warning("WireGuard reconcile skipped: wgctl circuit is open")
+        except Exception:
+            RECONCILE_RUNS.inc(result="error")
+            logger.exception("WireGuard reconcile failed")
+        await asyncio.sleep(interval_seconds)
+
+
+class Reconciler:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+
+    def start(self, interval_seconds: int | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(
+            _reconcile_loop(self._stop, interval_seconds or settings.reconcile_interval_seconds)
+        )
+
+    async def stop(self) -> None:
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def create_reconciler() -> Reconciler:
+    return Reconciler()
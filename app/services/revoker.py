@@ -1,14 +1,22 @@
 import asyncio
+import heapq
 import logging
-from datetime import datetime, timezone
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.db import SessionLocal
 from app.models.session import Session as SessionModel, SessionStatus
-from app.services.ip_alloc import quarantine_session
-from app.services.wireguard import wireguard_service
-from app.services.audit import audit
+from app.services.background import run_blocking
+from app.services.ip_alloc import quarantine_sessions
+from app.services.audit import audit_many
+from app.services.stats import session_status_changed
+from app.services.wg_outbox import enqueue_peer_ops
+from app.services.wireguard import PeerOp
 
 logger = logging.getLogger(__name__)
 
@@ -20,51 +28,214 @@ def _ensure_aware(dt: datetime) -> datetime:
     return dt
 
 
-async def _revoke_loop(stop_event: asyncio.Event, interval_seconds: int = 30) -> None:
-    while not stop_event.is_set():
-        await asyncio.sleep(interval_seconds)
-        _revoke_expired_once()
-
-
-def _revoke_expired_once() -> None:
+def _claim_due(db: Session, now: datetime, limit: int) -> list:
+    """Mark up to ``limit`` due sessions EXPIRED (uncommitted) and return them."""
+    due = (
+        select(SessionModel.id)
+        .where(SessionModel.status == SessionStatus.ACTIVE)
+        .where(SessionModel.expires_at <= now)
+        .order_by(SessionModel.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return db.execute(
+        update(SessionModel)
+        .where(SessionModel.id.in_(due))
+        .values(status=SessionStatus.EXPIRED, updated_at=now)
+        .returning(SessionModel.id, SessionModel.user_id, SessionModel.client_pubkey)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _expire_chunk(db: Session, now: datetime, limit: int) -> int:
+    """Expire up to ``limit`` due sessions in a single transaction.
+
+    The peer removals are queued in wg_outbox in the same transaction, so a
+    session is never EXPIRED without its peer eventually being removed.
+    """
+    claimed = _claim_due(db, now, limit)
+    if not claimed:
+        db.rollback()
+        return 0
+
+    session_status_changed(db, SessionStatus.ACTIVE, SessionStatus.EXPIRED, len(claimed))
+    quarantine_sessions(db, [session_id for session_id, _, _ in claimed])
+    enqueue_peer_ops(
+        db, [PeerOp("remove", session_id, client_pubkey) for session_id, _, client_pubkey in claimed]
+    )
+    audit_many(
+        db,
+        [
+            {"action": "session_expired", "user_id": user_id, "session_id": session_id, "detail": "Auto-expire"}
+            for session_id, user_id, _ in claimed
+        ],
+    )
+    db.commit()
+    return len(claimed)
+
+
+def _revoke_expired_once() -> int:
     now = datetime.now(timezone.utc)
+    batch_size = settings.revoker_batch_size
+    total = 0
     with SessionLocal() as db:
-        expired_sessions = (
-            db.query(SessionModel)
-            .filter(SessionModel.status == SessionStatus.ACTIVE)
-            .filter(SessionModel.expires_at <= now)
-            .all()
-        )
-        for sess in expired_sessions:
-            expires_at = _ensure_aware(sess.expires_at)
-            if expires_at > now:
-                continue
-
-            try:
-                wireguard_service.remove_peer(sess.id, sess.client_pubkey)  # best-effort first
-            except Exception as e:
-                logger.exception("Failed to remove peer for %s: %s", sess.id, e)
-                continue
+        while True:
+            started = time.monotonic()
+            expired = _expire_chunk(db, now, batch_size)
+            if expired:
+                logger.info("Expired %d sessions in %.3fs", expired, time.monotonic() - started)
+            total += expired
+            # a short chunk means the backlog is drained
+            if expired < batch_size:
+                break
+    return total
+
+
+class ExpiryDeadlines:
+    """In-memory min-heap of session deadlines the revoker sleeps on.
+
+    Routes call :meth:`schedule` / :meth:`discard` from threadpool threads; the
+    heap is only kept while a revoker is bound to an event loop in this process.
+    Superseded entries are dropped lazily when they reach the top of the heap.
+    """
 
-            sess.status = SessionStatus.EXPIRED
-            sess.updated_at = now
-            db.add(sess)
-            db.commit()
-            quarantine_session(db, sess.id)
-            audit(db, action="session_expired", user_id=sess.user_id, session_id=sess.id, detail="Auto-expire")
-            logger.info("Session %s expired automatically", sess.id)
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, str]] = []
+        self._current: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop, wakeup: asyncio.Event) -> None:
+        with self._lock:
+            self._loop = loop
+            self._wakeup = wakeup
+
+    def unbind(self) -> None:
+        with self._lock:
+            self._loop = None
+            self._wakeup = None
+            self._heap.clear()
+            self._current.clear()
+
+    def schedule(self, session_id: str, expires_at: datetime) -> None:
+        deadline = expires_at.timestamp()
+        with self._lock:
+            if self._loop is None:
+                return
+            earliest = self._peek_locked()
+            self._current[session_id] = deadline
+            heapq.heappush(self._heap, (deadline, session_id))
+            if earliest is not None and deadline >= earliest:
+                return
+            loop, wakeup = self._loop, self._wakeup
+        # the new deadline is the earliest one: cut the revoker's sleep short
+        loop.call_soon_threadsafe(wakeup.set)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._current.pop(session_id, None)
+
+    def next_deadline(self) -> float | None:
+        with self._lock:
+            return self._peek_locked()
+
+    def pop_due(self, now: float) -> int:
+        """Drop every deadline <= ``now`` and return how many were live."""
+        due = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, session_id = heapq.heappop(self._heap)
+                if self._current.get(session_id) == deadline:
+                    del self._current[session_id]
+                    due += 1
+        return due
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def _peek_locked(self) -> float | None:
+        while self._heap:
+            deadline, session_id = self._heap[0]
+            if self._current.get(session_id) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+
+expiry_deadlines = ExpiryDeadlines()
+
+
+def _load_upcoming_deadlines(horizon: timedelta) -> int:
+    """Schedule ACTIVE sessions expiring within ``horizon`` (covers sessions made by other processes)."""
+    until = datetime.now(timezone.utc) + horizon
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(SessionModel.id, SessionModel.expires_at)
+            .where(SessionModel.status == SessionStatus.ACTIVE)
+            .where(SessionModel.expires_at <= until)
+        ).all()
+    for session_id, expires_at in rows:
+        expiry_deadlines.schedule(session_id, _ensure_aware(expires_at))
+    return len(rows)
+
+
+async def _revoke_loop(
+    stop_event: asyncio.Event, wakeup: asyncio.Event, sweep_interval_seconds: int, poll_interval_seconds: float
+) -> None:
+    horizon = timedelta(seconds=2 * sweep_interval_seconds)
+    poll_horizon = timedelta(seconds=2 * poll_interval_seconds)
+    next_sweep = 0.0
+    next_poll = 0.0
+    while not stop_event.is_set():
+        now = time.time()
+        if now >= next_sweep:
+            # safety net: catches missed wakeups and anything the poll below skipped
+            expiry_deadlines.pop_due(now)
+            await run_blocking(_revoke_expired_once)
+            await run_blocking(_load_upcoming_deadlines, horizon)
+            next_sweep = time.time() + sweep_interval_seconds
+            next_poll = time.time() + poll_interval_seconds
+        else:
+            if now >= next_poll:
+                # sessions created or renewed in other processes never reach this heap directly;
+                # an index range scan on (status, expires_at) picks them up within one poll
+                await run_blocking(_load_upcoming_deadlines, poll_horizon)
+                next_poll = time.time() + poll_interval_seconds
+            if expiry_deadlines.pop_due(time.time()):
+                await run_blocking(_revoke_expired_once)
+
+        wake_at = min(next_sweep, next_poll)
+        deadline = expiry_deadlines.next_deadline()
+        if deadline is not None:
+            wake_at = min(wake_at, deadline)
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=max(0.0, wake_at - time.time()))
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
 
 
 class Revoker:
     def __init__(self) -> None:
         self._task: asyncio.Task | None = None
         self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
 
-    def start(self, interval_seconds: int = 30) -> None:
+    def start(self, sweep_interval_seconds: int | None = None, poll_interval_seconds: float | None = None) -> None:
         if self._task and not self._task.done():
             return
         self._stop.clear()
-        self._task = asyncio.create_task(_revoke_loop(self._stop, interval_seconds))
+        self._wakeup.clear()
+        expiry_deadlines.bind(asyncio.get_running_loop(), self._wakeup)
+        self._task = asyncio.create_task(
+            _revoke_loop(
+                self._stop,
+                self._wakeup,
+                sweep_interval_seconds or settings.revoker_sweep_interval_seconds,
+                poll_interval_seconds or settings.revoker_poll_interval_seconds,
+            )
+        )
 
     async def stop(self) -> None:
         if self._task:
@@ -74,6 +245,7 @@ class Revoker:
                 await self._task
             except asyncio.CancelledError:
                 pass
+        expiry_deadlines.unbind()
 
 
 def create_revoker() -> Revoker:
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models.ip_pool import IpPool, IpState
+from app.models.session import Session as SessionModel, SessionStatus
+from app.models.stats import StatsCounter
+from app.services.background import run_blocking
+from app.services.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+POOL_ADDRESSES = Gauge("wg_ip_pool_addresses", "IP pool addresses by state (maintained counters)", ["state"])
+SESSIONS = Gauge("wg_sessions", "Sessions by status (maintained counters)", ["status"])
+STATS_DRIFT = Counter("wg_stats_drift_total", "Absolute difference found by the periodic recount", ["counter"])
+
+IP_PREFIX = "ip_pool."
+SESSION_PREFIX = "sessions."
+
+_PENDING_KEY = "stats_deltas"
+
+# written only by the leader's recount: request commits use shards 0..N-1 and never touch it
+RECOUNT_SHARD = -1
+
+
+def count_change(db: Session, name: str, delta: int) -> None:
+    """Add ``delta`` to counter ``name`` when ``db`` commits (SessionLocal sessions only)."""
+    if delta:
+        if not db.in_transaction():
+            # a rollback with no transaction fires no after_rollback: the delta would leak into the next commit
+            db.begin()
+        pending = db.info.setdefault(_PENDING_KEY, defaultdict(int))
+        pending[name] += delta
+
+
+def ip_state_changed(db: Session, old: IpState | None, new: IpState | None, count: int = 1) -> None:
+    """``count`` addresses moved from ``old`` to ``new``; None means "no row" (sparse FREE)."""
+    if old == new or not count:
+        return
+    if old is not None:
+        count_change(db, IP_PREFIX + old.value, -count)
+    if new is not None:
+        count_change(db, IP_PREFIX + new.value, count)
+
+
+def session_status_changed(db: Session, old: SessionStatus | None, new: SessionStatus, count: int = 1) -> None:
+    if old == new or not count:
+        return
+    if old is not None:
+        count_change(db, SESSION_PREFIX + old.value, -count)
+    count_change(db, SESSION_PREFIX + new.value, count)
+
+
+def free_state() -> IpState | None:
+    # в sparse-режиме FREE не хранится: считается от ёмкости пула
+    return None if settings.ip_pool_mode == "sparse" else IpState.FREE
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _apply_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    # flush first so the counter rows are the last locks the transaction takes:
+    # nobody waits for a data row while holding a counter row, so no deadlocks
+    session.flush()
+    # one shard per transaction, names in order: concurrent commits lock rows in the same order
+    _add_deltas(session, pending, _shard())
+
+
+def _add_deltas(session: Session, deltas: dict[str, int], shard: int) -> None:
+    rows = [{"name": name, "shard": shard, "value": delta} for name, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    stmt = insert(StatsCounter).values(rows)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[StatsCounter.name, StatsCounter.shard],
+            set_={"value": StatsCounter.value + stmt.excluded.value},
+        )
+    )
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _shard() -> int:
+    # spreads concurrent commits over several rows per counter instead of one hot row
+    return random.randrange(max(1, settings.stats_counter_shards))
+
+
+def read_counters(db: Session) -> dict[str, int]:
+    rows = db.execute(select(StatsCounter.name, func.sum(StatsCounter.value)).group_by(StatsCounter.name)).all()
+    return {name: int(value) for name, value in rows}
+
+
+def _exact_counts(db: Session) -> dict[str, int]:
+    counts = {IP_PREFIX + state.value: 0 for state in IpState}
+    counts.update({SESSION_PREFIX + status.value: 0 for status in SessionStatus})
+    for state, n in db.execute(select(IpPool.state, func.count()).group_by(IpPool.state)).all():
+        counts[IP_PREFIX + state.value] = n
+    for status, n in db.execute(select(SessionModel.status, func.count()).group_by(SessionModel.status)).all():
+        counts[SESSION_PREFIX + status.value] = n
+    return counts
+
+
+def recount(db: Session) -> dict[str, int]:
+    """Correct the counters to the exact counts; returns the drift that was corrected. Commits.
+
+    Counters and counts are read from one REPEATABLE READ snapshot. A commit
+    writes its rows and its counter deltas together, so the snapshot sees both
+    or neither and the difference is drift only. It is added as one delta on
+    :data:`RECOUNT_SHARD`; nothing is locked or rewritten, and commits after
+    the snapshot keep adding their own deltas on top.
+    """
+    # must be the first statement of the transaction
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    current = read_counters(db)
+    exact = _exact_counts(db)
+    drift = {name: value - current.get(name, 0) for name, value in exact.items() if value != current.get(name, 0)}
+    _add_deltas(db, drift, RECOUNT_SHARD)
+    db.commit()
+    for name, diff in drift.items():
+        STATS_DRIFT.inc(abs(diff), counter=name)
+    _publish(exact)
+    return drift
+
+
+def _publish(counters: dict[str, int]) -> None:
+    for name, value in counters.items():
+        if name.startswith(IP_PREFIX):
+            POOL_ADDRESSES.set(value, state=name[len(IP_PREFIX):])
+        elif name.startswith(SESSION_PREFIX):
+            SESSIONS.set(value, status=name[len(SESSION_PREFIX):])
+
+
+class StatsCache:
+    """Counter totals cached for ``stats_cache_seconds``: dashboards polling every second cost one query per interval."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value: tuple[dict[str, int], datetime] | None = None
+        self._loaded_at = 0.0
+
+    def get(self, db: Session) -> tuple[dict[str, int], datetime]:
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._loaded_at < settings.stats_cache_seconds:
+                return self._value
+        counters = read_counters(db)
+        value = (counters, datetime.now(timezone.utc))
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+        _publish(counters)
+        return value
+
+
+stats_cache = StatsCache()
+
+
+def _recount_once() -> dict[str, int]:
+    with SessionLocal() as db:
+        drift = recount(db)
+    if drift:
+        logger.warning("Stats counters drifted, corrected: %s", drift)
+    return drift
+
+
+async def _recount_loop(stop_event: asyncio.Event, interval_seconds: int) -> None:
+    while not stop_event.is_set():
+        try:
+            await run_blocking(_recount_once)
+        except Exception:
+            logger.exception("Stats recount failed")
+        await asyncio.sleep(interval_seconds)
+
+
+class StatsRecounter:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+
+    def start(self, interval_seconds: int | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(
+            _recount_loop(self._stop, interval_seconds or settings.stats_recount_interval_seconds)
+        )
+
+    async def stop(self) -> None:
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def create_stats_recounter() -> StatsRecounter:
+    return StatsRecounter()
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, insert, select, text, update
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models.wg_outbox import WgOutbox
+from app.services.background import run_blocking
+from app.services.metrics import Counter, Histogram
+from app.services.wireguard import PeerOp, PeerResult, async_wireguard_service, wgctl_breaker
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_OPS = Counter("wg_outbox_ops_total", "Outbox rows handled by the dispatcher", ["result"])
+OUTBOX_DISPATCH = Histogram("wg_outbox_dispatch_seconds", "Duration of one outbox dispatch batch")
+
+_PENDING_KEY = "wg_outbox_pending"
+
+# (id, op, session_id, pubkey, allowed_ips, attempts)
+_Row = tuple[int, str, str | None, str, str | None, int]
+
+
+def enqueue_peer_op(db: Session, op: str, session_id: str, pubkey: str, allowed_ips: str | None = None) -> None:
+    """Queue a wgctl peer op; it is sent only if the caller's transaction commits."""
+    db.add(WgOutbox(op=op, session_id=session_id, pubkey=pubkey, allowed_ips=allowed_ips))
+    db.info[_PENDING_KEY] = True
+
+
+def enqueue_peer_ops(db: Session, ops: list[PeerOp]) -> None:
+    if not ops:
+        return
+    db.execute(
+        insert(WgOutbox),
+        [{"op": op.op, "session_id": op.session_id, "pubkey": op.pubkey, "allowed_ips": op.allowed_ips} for op in ops],
+    )
+    db.info[_PENDING_KEY] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(_PENDING_KEY, False):
+        outbox_dispatcher.wake()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _claim(db: Session, limit: int) -> list[_Row]:
+    """Lock the dispatcher slot and return the next due rows, oldest first.
+
+    One dispatcher at a time keeps ops on a pubkey in commit order; rows behind
+    an earlier row of the same pubkey that is backing off are held back too.
+    """
+    locked = db.execute(
+        text("SELECT pg_try_advisory_xact_lock(hashtext(:k))"),
+        {"k": f"{settings.project_name}:wg_outbox"},
+    ).scalar()
+    if not locked:
+        return []
+    now = datetime.now(timezone.utc)
+    earlier = aliased(WgOutbox)
+    blocked = (
+        select(earlier.id)
+        .where(earlier.pubkey == WgOutbox.pubkey, earlier.id < WgOutbox.id, earlier.next_attempt_at > now)
+        .exists()
+    )
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(
+                WgOutbox.id, WgOutbox.op, WgOutbox.session_id, WgOutbox.pubkey, WgOutbox.allowed_ips, WgOutbox.attempts,
+            )
+            .where(WgOutbox.next_attempt_at <= now, ~blocked)
+            .order_by(WgOutbox.id)
+            .limit(limit)
+        ).all()
+    ]
+
+
+def merge_ops(rows: list[_Row]) -> list[tuple[PeerOp | None, list[int], int]]:
+    """Collapse the rows of each pubkey into the single op that reaches the same end state.
+
+    Returns ``(op, row_ids, attempts)`` per pubkey; ``op`` is None when an add
+    that was never sent is followed by a remove, i.e. there is nothing to do.
+    """
+    merged: dict[str, tuple[PeerOp | None, list[int], int]] = {}
+    for row_id, op, session_id, pubkey, allowed_ips, attempts in rows:
+        current, ids, max_attempts = merged.get(pubkey, (None, [], 0))
+        ids.append(row_id)
+        if op == "remove" and current is not None and current.op == "add" and max_attempts == 0:
+            current = None
+        else:
+            current = PeerOp(op, session_id or "-", pubkey, allowed_ips)
+        merged[pubkey] = (current, ids, max(max_attempts, attempts))
+    return list(merged.values())
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, settings.outbox_retry_max_seconds))
+
+
+def _finish(db: Session, merged: list[tuple[PeerOp | None, list[int], int]], results: dict[str, PeerResult]) -> None:
+    done: list[int] = []
+    now = datetime.now(timezone.utc)
+    for op, ids, attempts in merged:
+        if op is None:
+            OUTBOX_OPS.inc(len(ids), result="cancelled")
+            done += ids
+            continue
+        result = results.get(op.pubkey)
+        if result is None:
+            # nothing came back for this pubkey: same as a failed attempt, never a silent success
+            result = PeerResult(op=op, ok=False, error="no result from wgctl")
+        if not result.attempted:
+            # refused by the open circuit: the rows stay due as they are, no attempt is used up
+            OUTBOX_OPS.inc(len(ids), result="deferred")
+        elif result.ok:
+            OUTBOX_OPS.inc(len(ids), result="applied")
+            done += ids
+        elif attempts + 1 >= settings.outbox_max_attempts:
+            # the reconciler repairs whatever this op would have changed
+            logger.error("Dropping wgctl %s for %s after %d attempts: %s", op.op, op.pubkey, attempts + 1, result.error)
+            OUTBOX_OPS.inc(len(ids), result="dropped")
+            done += ids
+        else:
+            OUTBOX_OPS.inc(len(ids), result="failed")
+            db.execute(
+                update(WgOutbox)
+                .where(WgOutbox.id.in_(ids))
+                .values(
+                    attempts=attempts + 1,
+                    next_attempt_at=now + _backoff(attempts),
+                    last_error=result.error,
+                )
+                .execution_options(synchronize_session=False)
+            )
+    if done:
+        db.execute(delete(WgOutbox).where(WgOutbox.id.in_(done)).execution_options(synchronize_session=False))
+    db.commit()
+
+
+async def dispatch_once() -> int:
+    """Send one batch of due outbox rows to wgctl; returns how many rows were claimed."""
+    if not wgctl_breaker.available():
+        # rows stay queued without burning attempts until the breaker lets a probe through
+        return 0
+    db = SessionLocal()
+    try:
+        rows = await run_blocking(_claim, db, settings.outbox_batch_size)
+        if not rows:
+            await run_blocking(db.rollback)
+            return 0
+        started = time.monotonic()
+        merged = merge_ops(rows)
+        results = await async_wireguard_service.apply([op for op, _, _ in merged if op is not None])
+        await run_blocking(_finish, db, merged, {result.op.pubkey: result for result in results})
+        OUTBOX_DISPATCH.observe(time.monotonic() - started)
+        return len(rows)
+    finally:
+        await run_blocking(db.close)
+
+
+async def _dispatch_loop(stop_event: asyncio.Event, wakeup: asyncio.Event, poll_interval_seconds: float) -> None:
+    while not stop_event.is_set():
+        try:
+            while await dispatch_once() >= settings.outbox_batch_size:
+                pass
+        except Exception:
+            logger.exception("wg outbox dispatch failed")
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=poll_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+
+
+class OutboxDispatcher:
+    """Drains wg_outbox in every process; a commit that queued ops wakes it immediately."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def start(self, poll_interval_seconds: float | None = None) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(
+            _dispatch_loop(
+                self._stop,
+                self._wakeup,
+                poll_interval_seconds or settings.outbox_poll_interval_seconds,
+            )
+        )
+
+    def wake(self) -> None:
+        with self._lock:
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def stop(self) -> None:
+        with self._lock:
+            self._loop = None
+        if self._task:
+            self._stop.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -1,68 +1,428 @@
+import asyncio
+import contextlib
 import logging
-import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator
 
 import httpx
 from app.config import settings
+from app.services.metrics import Counter, Gauge, Histogram
 
 logger = logging.getLogger(__name__)
 
+WGCTL_LATENCY = Histogram("wg_wgctl_request_seconds", "wgctl request latency", ["op"])
+WGCTL_ERRORS = Counter("wg_wgctl_errors_total", "Failed wgctl requests", ["op", "kind"])
+WGCTL_CIRCUIT_STATE = Gauge("wg_wgctl_circuit_state", "wgctl circuit breaker state (0 closed, 1 open, 2 half-open)")
+WGCTL_CIRCUIT_TRANSITIONS = Counter("wg_wgctl_circuit_transitions_total", "wgctl circuit breaker transitions", ["state"])
+
 
 _client = httpx.Client(
     transport=httpx.HTTPTransport(uds=settings.wgctl_socket),
     base_url="http://wgctl",
-    timeout=5.0,
+    timeout=settings.wgctl_timeout_seconds,
 )
 
 
+def _headers() -> dict[str, str]:
+    return {"X-WGCTL-Token": settings.wgctl_token}
+
+
+def _log_ok(op: str, session_id: str, client_pubkey: str, r: httpx.Response) -> None:
+    logger.info("[WG] %s peer OK session=%s pubkey=%s action=%s",
+                op, session_id, client_pubkey, r.json().get("action"))
+
+
+def _log_error(op: str, session_id: str, client_pubkey: str, e: Exception) -> None:
+    if isinstance(e, httpx.HTTPStatusError):
+        body = getattr(e.response, "text", "")
+        logger.error("[WG] %s peer FAILED session=%s pubkey=%s status=%s body=%r",
+                     op, session_id, client_pubkey,
+                     e.response.status_code if e.response else None, body)
+    else:
+        logger.exception("[WG] %s peer ERROR session=%s pubkey=%s err=%r",
+                         op, session_id, client_pubkey, e)
+
+
+@dataclass(frozen=True)
+class PeerOp:
+    op: str  # "add" | "remove"
+    session_id: str
+    pubkey: str
+    allowed_ips: str | None = None
+
+    def payload(self) -> dict:
+        item = {"op": self.op, "pubkey": self.pubkey}
+        if self.op == "add":
+            item["allowed_ips"] = self.allowed_ips
+        return item
+
+
+@dataclass(frozen=True)
+class PeerResult:
+    op: PeerOp
+    ok: bool
+    action: str | None = None
+    error: str | None = None
+    # False when the circuit breaker refused the call: wgctl never saw the op
+    attempted: bool = True
+
+
+def _chunks(ops: list[PeerOp]) -> Iterator[list[PeerOp]]:
+    size = settings.wgctl_batch_size
+    for i in range(0, len(ops), size):
+        yield ops[i:i + size]
+
+
+def _batch_results(ops: list[PeerOp], r: httpx.Response) -> list[PeerResult]:
+    items = r.json()["results"]
+    results = []
+    for op, item in zip(ops, items):
+        results.append(PeerResult(op=op, ok=bool(item.get("ok")), action=item.get("action"), error=item.get("error")))
+        if not results[-1].ok:
+            logger.error("[WG] batch %s peer FAILED session=%s pubkey=%s err=%r",
+                         op.op, op.session_id, op.pubkey, results[-1].error)
+    if len(items) != len(ops):
+        logger.error("[WG] wgctl returned %d results for a batch of %d ops", len(items), len(ops))
+    if len(items) < len(ops):
+        # zip() stops at the shorter list: the ops without a result were never confirmed
+        results.extend(_failed(ops[len(items):], ValueError("no result from wgctl")))
+    return results
+
+
+def _failed(ops: list[PeerOp], e: Exception) -> list[PeerResult]:
+    logger.error("[WG] batch of %d peer ops FAILED err=%r", len(ops), e)
+    attempted = not isinstance(e, CircuitOpenError)
+    return [PeerResult(op=op, ok=False, error=repr(e), attempted=attempted) for op in ops]
+
+
+def _peer_map(r: httpx.Response) -> dict[str, str]:
+    return {peer["pubkey"]: peer.get("allowed_ips") or "" for peer in r.json()["peers"]}
+
+
+def _batch_unsupported(e: Exception) -> bool:
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code in (404, 405)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by the sync and async wgctl clients.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast with :class:`CircuitOpenError`; after ``reset_seconds`` a single
+    probe is let through (half-open) and its outcome closes or reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _GAUGE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        WGCTL_CIRCUIT_STATE.set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def available(self) -> bool:
+        """Whether a call made now would be let through (does not take the half-open probe)."""
+        with self._lock:
+            return self._state == self.CLOSED or self._probe_due()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._probe_due():
+                # a probe that never reported back (e.g. cancelled) is replaced after another reset period
+                self._opened_at = time.monotonic()
+                if self._state != self.HALF_OPEN:
+                    self._set_state(self.HALF_OPEN)
+                return
+            raise CircuitOpenError("wgctl circuit is open")
+
+    def _probe_due(self) -> bool:
+        return time.monotonic() - self._opened_at >= self._reset_seconds
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self._failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        if state == self.OPEN:
+            logger.error("[WG] wgctl circuit opened after %d failures", self._failures)
+        elif state == self.CLOSED:
+            logger.info("[WG] wgctl circuit closed")
+        self._state = state
+        WGCTL_CIRCUIT_STATE.set(self._GAUGE_VALUES[state])
+        WGCTL_CIRCUIT_TRANSITIONS.inc(state=state)
+
+
+wgctl_breaker = CircuitBreaker(
+    failure_threshold=settings.wgctl_breaker_failure_threshold,
+    reset_seconds=settings.wgctl_breaker_reset_seconds,
+)
+
+
+def _error_kind(e: Exception) -> str:
+    if isinstance(e, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"http_{e.response.status_code // 100}xx"
+    if isinstance(e, httpx.TransportError):
+        return "transport"
+    return "other"
+
+
+def _record_outcome(op: str, started: float, e: Exception | None) -> None:
+    WGCTL_LATENCY.observe(time.monotonic() - started, op=op)
+    if e is None:
+        wgctl_breaker.record_success()
+        return
+    WGCTL_ERRORS.inc(op=op, kind=_error_kind(e))
+    # a 4xx is an answer from a healthy gateway, not a reason to open the circuit
+    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+        wgctl_breaker.record_success()
+    else:
+        wgctl_breaker.record_failure()
+
+
+def _send(op: str, request: Callable[[], httpx.Response]) -> httpx.Response:
+    try:
+        wgctl_breaker.before_call()
+    except CircuitOpenError:
+        WGCTL_ERRORS.inc(op=op, kind="circuit_open")
+        raise
+    started = time.monotonic()
+    try:
+        r = request()
+        r.raise_for_status()
+    except Exception as e:
+        _record_outcome(op, started, e)
+        raise
+    _record_outcome(op, started, None)
+    return r
+
+
+async def _send_async(
+    op: str, request: Callable[[], Awaitable[httpx.Response]], slots: asyncio.Semaphore | None = None
+) -> httpx.Response:
+    # breaker and timer start once a slot is held: queueing for a connection is neither
+    # wgctl latency nor a reason to take the half-open probe
+    async with slots or contextlib.nullcontext():
+        try:
+            wgctl_breaker.before_call()
+        except CircuitOpenError:
+            WGCTL_ERRORS.inc(op=op, kind="circuit_open")
+            raise
+        started = time.monotonic()
+        try:
+            r = await request()
+            r.raise_for_status()
+        except Exception as e:
+            _record_outcome(op, started, e)
+            raise
+        _record_outcome(op, started, None)
+        return r
+
+
 class WireGuardService:
     """WireGuard control via wg-daemon (unix socket)."""
 
+    def __init__(self) -> None:
+        self._batch_supported = True
+
     def add_peer(self, session_id: str, client_pubkey: str, allowed_ips: str) -> None:
         logger.info("[WG] add peer session=%s pubkey=%s allowed_ips=%s",
                     session_id, client_pubkey, allowed_ips)
         try:
-            r = _client.post(
+            r = _send("add", lambda: _client.post(
                 "/peer/add",
                 json={"pubkey": client_pubkey, "allowed_ips": allowed_ips},
-                headers={"X-WGCTL-Token": settings.wgctl_token},
-            )
-            r.raise_for_status()
-            action = r.json().get("action")
-            logger.info("[WG] add peer OK session=%s pubkey=%s action=%s",
-                        session_id, client_pubkey, action)
-        except httpx.HTTPStatusError as e:
-            body = getattr(e.response, "text", "")
-            logger.error("[WG] add peer FAILED session=%s pubkey=%s status=%s body=%r",
-                         session_id, client_pubkey,
-                         e.response.status_code if e.response else None, body)
-            raise
+                headers=_headers(),
+            ))
+            _log_ok("add", session_id, client_pubkey, r)
         except Exception as e:
-            logger.exception("[WG] add peer ERROR session=%s pubkey=%s err=%r",
-                             session_id, client_pubkey, e)
+            _log_error("add", session_id, client_pubkey, e)
             raise
 
     def remove_peer(self, session_id: str, client_pubkey: str) -> None:
         logger.info("[WG] remove peer session=%s pubkey=%s",
                     session_id, client_pubkey)
         try:
-            r = _client.post(
+            r = _send("remove", lambda: _client.post(
                 "/peer/remove",
                 json={"pubkey": client_pubkey},
-                headers={"X-WGCTL-Token": settings.wgctl_token},
+                headers=_headers(),
+            ))
+            _log_ok("remove", session_id, client_pubkey, r)
+        except Exception as e:
+            _log_error("remove", session_id, client_pubkey, e)
+            raise
+
+    def list_peers(self) -> dict[str, str]:
+        """Peers currently configured on the interface: ``{pubkey: allowed_ips}``."""
+        r = _send("list", lambda: _client.get("/peers", headers=_headers()))
+        return _peer_map(r)
+
+    def add_peers(self, peers: list[tuple[str, str, str]]) -> list[PeerResult]:
+        """Add ``(session_id, pubkey, allowed_ips)`` peers, one wgctl request per batch."""
+        return self.apply(PeerOp("add", session_id, pubkey, allowed_ips) for session_id, pubkey, allowed_ips in peers)
+
+    def remove_peers(self, peers: list[tuple[str, str]]) -> list[PeerResult]:
+        """Remove ``(session_id, pubkey)`` peers, one wgctl request per batch."""
+        return self.apply(PeerOp("remove", session_id, pubkey) for session_id, pubkey in peers)
+
+    def apply(self, ops) -> list[PeerResult]:
+        """Apply peer ops in ``wgctl_batch_size`` batches; never raises, failures are per-peer."""
+        results: list[PeerResult] = []
+        for chunk in _chunks(list(ops)):
+            if self._batch_supported:
+                try:
+                    r = _send(
+                        "batch",
+                        lambda: _client.post("/peer/batch", json={"ops": [op.payload() for op in chunk]}, headers=_headers()),
+                    )
+                    results.extend(_batch_results(chunk, r))
+                    continue
+                except Exception as e:
+                    if not _batch_unsupported(e):
+                        results.extend(_failed(chunk, e))
+                        continue
+                    logger.warning("[WG] wgctl has no /peer/batch endpoint, falling back to single-peer calls")
+                    self._batch_supported = False
+            results.extend(self._apply_one(op) for op in chunk)
+        return results
+
+    def _apply_one(self, op: PeerOp) -> PeerResult:
+        try:
+            if op.op == "add":
+                self.add_peer(op.session_id, op.pubkey, op.allowed_ips)
+            else:
+                self.remove_peer(op.session_id, op.pubkey)
+        except Exception as e:
+            return PeerResult(op=op, ok=False, error=repr(e), attempted=not isinstance(e, CircuitOpenError))
+        return PeerResult(op=op, ok=True)
+
+
+class AsyncWireGuardService:
+    """Non-blocking variant of :class:`WireGuardService` for async routes and background loops.
+
+    Requests share one keep-alive connection pool of ``wgctl_max_connections``;
+    callers beyond that wait on a semaphore instead of hitting the pool timeout.
+    The client is created lazily so it binds to the running event loop.
+    """
+
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._batch_supported = True
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=settings.wgctl_max_connections,
+                max_keepalive_connections=settings.wgctl_max_connections,
             )
-            r.raise_for_status()
-            action = r.json().get("action")
-            logger.info("[WG] remove peer OK session=%s pubkey=%s action=%s",
-                        session_id, client_pubkey, action)
-        except httpx.HTTPStatusError as e:
-            body = getattr(e.response, "text", "")
-            logger.error("[WG] remove peer FAILED session=%s pubkey=%s status=%s body=%r",
-                         session_id, client_pubkey,
-                         e.response.status_code if e.response else None, body)
+            self._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=settings.wgctl_socket, limits=limits),
+                base_url="http://wgctl",
+                timeout=settings.wgctl_timeout_seconds,
+            )
+            self._slots = asyncio.Semaphore(settings.wgctl_max_connections)
+        return self._client
+
+    async def _request(self, op: str, method: str, path: str, payload: dict | None = None) -> httpx.Response:
+        client = self._get_client()
+        return await _send_async(
+            op, lambda: client.request(method, path, json=payload, headers=_headers()), self._slots
+        )
+
+    async def add_peer(self, session_id: str, client_pubkey: str, allowed_ips: str) -> None:
+        logger.info("[WG] add peer session=%s pubkey=%s allowed_ips=%s",
+                    session_id, client_pubkey, allowed_ips)
+        try:
+            r = await self._request("add", "POST", "/peer/add", {"pubkey": client_pubkey, "allowed_ips": allowed_ips})
+            _log_ok("add", session_id, client_pubkey, r)
+        except Exception as e:
+            _log_error("add", session_id, client_pubkey, e)
             raise
+
+    async def remove_peer(self, session_id: str, client_pubkey: str) -> None:
+        logger.info("[WG] remove peer session=%s pubkey=%s",
+                    session_id, client_pubkey)
+        try:
+            r = await self._request("remove", "POST", "/peer/remove", {"pubkey": client_pubkey})
+            _log_ok("remove", session_id, client_pubkey, r)
         except Exception as e:
-            logger.exception("[WG] remove peer ERROR session=%s pubkey=%s err=%r",
-                             session_id, client_pubkey, e)
+            _log_error("remove", session_id, client_pubkey, e)
             raise
 
+    async def list_peers(self) -> dict[str, str]:
+        r = await self._request("list", "GET", "/peers")
+        return _peer_map(r)
+
+    async def add_peers(self, peers: list[tuple[str, str, str]]) -> list[PeerResult]:
+        return await self.apply(PeerOp("add", session_id, pubkey, allowed_ips) for session_id, pubkey, allowed_ips in peers)
+
+    async def remove_peers(self, peers: list[tuple[str, str]]) -> list[PeerResult]:
+        return await self.apply(PeerOp("remove", session_id, pubkey) for session_id, pubkey in peers)
+
+    async def apply(self, ops) -> list[PeerResult]:
+        """Apply peer ops in ``wgctl_batch_size`` batches sent concurrently; never raises."""
+        chunks = list(_chunks(list(ops)))
+        results = await asyncio.gather(*(self._apply_chunk(chunk) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def _apply_chunk(self, chunk: list[PeerOp]) -> list[PeerResult]:
+        if self._batch_supported:
+            try:
+                r = await self._request("batch", "POST", "/peer/batch", {"ops": [op.payload() for op in chunk]})
+                return _batch_results(chunk, r)
+            except Exception as e:
+                if not _batch_unsupported(e):
+                    return _failed(chunk, e)
+                logger.warning("[WG] wgctl has no /peer/batch endpoint, falling back to single-peer calls")
+                self._batch_supported = False
+        return list(await asyncio.gather(*(self._apply_one(op) for op in chunk)))
+
+    async def _apply_one(self, op: PeerOp) -> PeerResult:
+        try:
+            if op.op == "add":
+                await self.add_peer(op.session_id, op.pubkey, op.allowed_ips)
+            else:
+                await self.remove_peer(op.session_id, op.pubkey)
+        except Exception as e:
+            return PeerResult(op=op, ok=False, error=repr(e), attempted=not isinstance(e, CircuitOpenError))
+        return PeerResult(op=op, ok=True)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._slots = None
+
+
 wireguard_service = WireGuardService()
+async_wireguard_service = AsyncWireGuardService()
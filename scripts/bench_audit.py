@@ -0,0 +1,89 @@
+"""Commit savings of the buffered audit writer vs one commit per audit entry.
+
+Each simulated request does one business write + commit and then records an
+audit entry, like the session routes. Runs in a scratch schema in
+WG_DATABASE_URL:
+
+    python -m scripts.bench_audit --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.services import audit as audit_service
+from app.services.audit_partitions import ensure_partitions
+from scripts.bench_ip_alloc import drop_scratch, scratch_engine
+
+
+def _request(factory: sessionmaker, i: int) -> float:
+    started = time.perf_counter()
+    with factory() as db:
+        db.execute(
+            text(
+                "INSERT INTO service_state (key, value) VALUES (:k, :v) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = now()"
+            ),
+            {"k": f"bench-{i % 64}", "v": str(i)},
+        )
+        db.commit()
+        audit_service.audit(db, action="bench", user_id=i, detail="bench_audit")
+    return time.perf_counter() - started
+
+
+async def _run(factory: sessionmaker, requests: int, concurrency: int, buffered: bool) -> tuple[float, list[float]]:
+    settings.audit_mode = "buffered" if buffered else "sync"
+    writer = audit_service.AuditWriter(factory)
+    audit_service.audit_writer = writer
+    writer.start()
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = await asyncio.gather(*(loop.run_in_executor(pool, _request, factory, i) for i in range(requests)))
+    # the shutdown flush is part of the cost
+    await writer.stop()
+    return time.perf_counter() - started, sorted(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    engine = scratch_engine(args.database_url, pool_size=args.concurrency, max_overflow=0)
+    factory = sessionmaker(engine)
+    with Session(engine) as db:
+        ensure_partitions(db)
+    commits = {"n": 0}
+
+    @event.listens_for(engine, "commit")
+    def _count_commit(_conn) -> None:
+        commits["n"] += 1
+
+    try:
+        print(f"{'mode':<10}{'wall s':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'commits':>10}{'commit/req':>12}{'rows':>8}")
+        for mode in ("sync", "buffered"):
+            with engine.begin() as conn:
+                conn.execute(text("TRUNCATE audit_logs"))
+            commits["n"] = 0
+            wall, timings = asyncio.run(_run(factory, args.requests, args.concurrency, mode == "buffered"))
+            with engine.connect() as conn:
+                rows = conn.execute(text("SELECT count(*) FROM audit_logs")).scalar()
+            print(
+                f"{mode:<10}{wall:>10.2f}{args.requests / wall:>10.0f}"
+                f"{statistics.median(timings) * 1000:>10.2f}{timings[int(len(timings) * 0.95) - 1] * 1000:>10.2f}"
+                f"{commits['n']:>10}{commits['n'] / args.requests:>12.2f}{rows:>8}"
+            )
+    finally:
+        drop_scratch(engine)
+
+
+if __name__ == "__main__":
+    main()
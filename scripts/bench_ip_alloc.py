@@ -0,0 +1,124 @@
+"""Benchmark IP allocation strategies on /24, /20 and /16 pools.
+
+Runs against the database from WG_DATABASE_URL in a scratch schema that is
+dropped afterwards, so the service's own ip_pool is never touched:
+
+    python -m scripts.bench_ip_alloc --allocations 500 --assigned-ratio 0.5
+"""
+import argparse
+import ipaddress
+import statistics
+import time
+
+from sqlalchemy import Engine, create_engine, event, func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.base import Base
+from app.models.ip_pool import IpPool, IpState
+from app.services import ip_alloc
+
+SCHEMA = "bench_ip_alloc"
+
+
+def _allocate_order_by_random(db: Session, session_id) -> str:
+    """The previous allocator, kept here as the baseline."""
+    row = (
+        db.execute(
+            select(IpPool)
+            .where(IpPool.state == IpState.FREE)
+            .order_by(func.random())
+            .with_for_update(skip_locked=True)
+            .limit(1)
+        )
+        .scalars()
+        .first()
+    )
+    row.state = IpState.ASSIGNED
+    row.session_id = session_id
+    return str(row.ip)
+
+
+STRATEGIES = {
+    "order_by_random": _allocate_order_by_random,
+    "random_pivot_seek": ip_alloc.allocate_ip,
+}
+
+
+def scratch_engine(database_url: str, **engine_kwargs) -> Engine:
+    """Engine whose connections work in the scratch schema, with the app tables created."""
+    engine = create_engine(database_url, **engine_kwargs)
+
+    @event.listens_for(engine, "connect")
+    def _use_scratch_schema(dbapi_conn, _record) -> None:
+        # outside of a transaction, otherwise the pool's reset-on-return rolls SET back
+        dbapi_conn.autocommit = True
+        with dbapi_conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+        dbapi_conn.autocommit = False
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def drop_scratch(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+def fill_pool(db: Session, cidr: str, assigned_ratio: float) -> int:
+    net = ipaddress.ip_network(cidr, strict=False)
+    db.execute(text("TRUNCATE ip_pool"))
+    db.execute(
+        text(
+            "INSERT INTO ip_pool (ip, state) "
+            "SELECT CAST(:first AS inet) + g, "
+            "       CAST(CASE WHEN random() < :ratio THEN 'ASSIGNED' ELSE 'FREE' END AS ip_state) "
+            "FROM generate_series(0, :n - 1) AS g"
+        ),
+        {"first": str(net.network_address + 1), "n": net.num_addresses - 2, "ratio": assigned_ratio},
+    )
+    db.commit()
+    db.execute(text("ANALYZE ip_pool"))
+    return net.num_addresses - 2
+
+
+def _run(db: Session, allocate, allocations: int) -> list[float]:
+    timings = []
+    for _ in range(allocations):
+        started = time.perf_counter()
+        allocate(db, None)
+        db.flush()
+        timings.append(time.perf_counter() - started)
+        db.rollback()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--allocations", type=int, default=500)
+    parser.add_argument("--assigned-ratio", type=float, default=0.5)
+    parser.add_argument("--cidrs", nargs="+", default=["10.0.0.0/24", "10.0.0.0/20", "10.0.0.0/16"])
+    args = parser.parse_args()
+
+    engine = scratch_engine(args.database_url)
+    try:
+        print(f"{'pool':<16}{'size':>8}  {'strategy':<20}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        with Session(engine) as db:
+            for cidr in args.cidrs:
+                size = fill_pool(db, cidr, args.assigned_ratio)
+                settings.network_cidr = cidr
+                for name, allocate in STRATEGIES.items():
+                    timings = sorted(_run(db, allocate, args.allocations))
+                    p50 = statistics.median(timings) * 1000
+                    p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+                    print(f"{cidr:<16}{size:>8}  {name:<20}{p50:>10.3f}{p95:>10.3f}{timings[-1] * 1000:>10.3f}")
+    finally:
+        drop_scratch(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Contention benchmark: direct allocation vs per-process lease blocks.
+
+Fires ``--sessions`` concurrent allocations (each in its own transaction, like
+POST /v1/sessions) against a scratch schema in WG_DATABASE_URL:
+
+    python -m scripts.bench_ip_lease --sessions 500 --block-size 64
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.services import ip_alloc
+from scripts.bench_ip_alloc import drop_scratch, fill_pool, scratch_engine
+
+
+def _allocate_one(factory: sessionmaker) -> float:
+    started = time.perf_counter()
+    with factory() as db:
+        ip_alloc.allocate_ip(db, None)
+        db.commit()
+    return time.perf_counter() - started
+
+
+def _run(factory: sessionmaker, sessions: int, concurrency: int) -> tuple[float, list[float]]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(lambda _: _allocate_one(factory), range(sessions)))
+    return time.perf_counter() - started, sorted(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--cidr", default="10.0.0.0/20")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=50, help="DB connections shared by the workers")
+    parser.add_argument("--block-size", type=int, default=64)
+    args = parser.parse_args()
+
+    engine = scratch_engine(args.database_url, pool_size=args.pool_size, max_overflow=0)
+    factory = sessionmaker(engine)
+    settings.network_cidr = args.cidr
+    try:
+        print(f"{'mode':<12}{'wall s':>10}{'alloc/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'assigned':>10}")
+        for mode, block_size in (("direct", 0), ("lease", args.block_size)):
+            with Session(engine) as db:
+                fill_pool(db, args.cidr, 0.0)
+            settings.ip_lease_block_size = block_size
+            ip_alloc.ip_leases = ip_alloc.IpLeaseCache(factory, owner="bench")
+
+            wall, timings = _run(factory, args.sessions, args.concurrency)
+            ip_alloc.ip_leases.release()
+            with Session(engine) as db:
+                assigned = db.execute(text("SELECT count(*) FROM ip_pool WHERE state = 'ASSIGNED'")).scalar()
+            if assigned != args.sessions:
+                raise SystemExit(f"{mode}: expected {args.sessions} distinct ASSIGNED IPs, got {assigned}")
+
+            p = lambda q: timings[max(0, int(len(timings) * q) - 1)] * 1000  # noqa: E731
+            print(
+                f"{mode:<12}{wall:>10.2f}{args.sessions / wall:>10.1f}"
+                f"{statistics.median(timings) * 1000:>10.2f}{p(0.95):>10.2f}{p(0.99):>10.2f}{assigned:>10}"
+            )
+    finally:
+        drop_scratch(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Local stand-in for wgctl: speaks its HTTP protocol over a unix socket, keeps peers in memory.
+
+    python -m scripts.fake_wgctl --socket /tmp/wgctl.sock --token secret-token-change-me \
+        --latency-ms 5 --jitter-ms 20 --error-rate 0.01
+
+Point the service at it with WG_WGCTL_SOCKET / WG_WGCTL_TOKEN. No WireGuard
+interface or NET_ADMIN is needed. Faults can be changed while it runs with
+``PUT /_faults`` (same fields as :class:`Faults`), and ``DELETE /peers``
+drops every peer like a gateway restart would.
+"""
+import argparse
+import asyncio
+import os
+import random
+
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException
+from pydantic import BaseModel
+
+
+class PeerAdd(BaseModel):
+    pubkey: str
+    allowed_ips: str
+
+
+class PeerRemove(BaseModel):
+    pubkey: str
+
+
+class BatchOp(BaseModel):
+    op: str
+    pubkey: str
+    allowed_ips: str | None = None
+
+
+class Batch(BaseModel):
+    ops: list[BatchOp]
+
+
+class Faults(BaseModel):
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0  # extra uniform 0..jitter_ms delay
+    error_rate: float = 0.0  # share of requests answered with 503
+    hang_rate: float = 0.0  # share of requests that never answer (client timeout)
+
+
+def create_fake_wgctl(token: str, faults: Faults | None = None) -> FastAPI:
+    app = FastAPI(title="fake-wgctl")
+    peers: dict[str, str] = {}
+    state = {"faults": faults or Faults()}
+
+    async def _check(x_wgctl_token: str | None) -> None:
+        if x_wgctl_token != token:
+            raise HTTPException(status_code=401, detail="bad token")
+        current: Faults = state["faults"]
+        delay = current.latency_ms + random.uniform(0, current.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if current.hang_rate and random.random() < current.hang_rate:
+            await asyncio.sleep(3600)
+        if current.error_rate and random.random() < current.error_rate:
+            raise HTTPException(status_code=503, detail="injected failure")
+
+    def _add(pubkey: str, allowed_ips: str) -> str:
+        action = "updated" if pubkey in peers else "added"
+        peers[pubkey] = allowed_ips
+        return action
+
+    def _remove(pubkey: str) -> str:
+        return "removed" if peers.pop(pubkey, None) is not None else "absent"
+
+    @app.get("/peers")
+    async def peer_list(x_wgctl_token: str | None = Header(default=None)) -> dict:
+        await _check(x_wgctl_token)
+        return {"peers": [{"pubkey": pubkey, "allowed_ips": allowed_ips} for pubkey, allowed_ips in peers.items()]}
+
+    @app.delete("/peers")
+    async def peer_flush(x_wgctl_token: str | None = Header(default=None)) -> dict:
+        if x_wgctl_token != token:
+            raise HTTPException(status_code=401, detail="bad token")
+        dropped = len(peers)
+        peers.clear()
+        return {"dropped": dropped}
+
+    @app.put("/_faults")
+    async def set_faults(payload: Faults, x_wgctl_token: str | None = Header(default=None)) -> Faults:
+        if x_wgctl_token != token:
+            raise HTTPException(status_code=401, detail="bad token")
+        state["faults"] = payload
+        return payload
+
+    @app.post("/peer/add")
+    async def peer_add(payload: PeerAdd, x_wgctl_token: str | None = Header(default=None)) -> dict:
+        await _check(x_wgctl_token)
+        return {"action": _add(payload.pubkey, payload.allowed_ips)}
+
+    @app.post("/peer/remove")
+    async def peer_remove(payload: PeerRemove, x_wgctl_token: str | None = Header(default=None)) -> dict:
+        await _check(x_wgctl_token)
+        return {"action": _remove(payload.pubkey)}
+
+    @app.post("/peer/batch")
+    async def peer_batch(payload: Batch, x_wgctl_token: str | None = Header(default=None)) -> dict:
+        await _check(x_wgctl_token)
+        results = []
+        for item in payload.ops:
+            if item.op == "add" and item.allowed_ips:
+                results.append({"pubkey": item.pubkey, "op": item.op, "ok": True, "action": _add(item.pubkey, item.allowed_ips)})
+            elif item.op == "remove":
+                results.append({"pubkey": item.pubkey, "op": item.op, "ok": True, "action": _remove(item.pubkey)})
+            else:
+                results.append({"pubkey": item.pubkey, "op": item.op, "ok": False, "error": "bad op"})
+        return {"results": results}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default="/tmp/wgctl.sock")
+    parser.add_argument("--token", default=os.environ.get("WG_WGCTL_TOKEN", "secret-token-change-me"))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = Faults(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, hang_rate=args.hang_rate,
+    )
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    uvicorn.run(create_fake_wgctl(args.token, faults), uds=args.socket, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""End-to-end load test: auth/start -> verify-mfa -> create session -> config -> renew -> revoke.
+
+Run the service against a local Postgres and the fake wgctl, then drive it:
+
+    python -m scripts.fake_wgctl --socket /tmp/wgctl.sock --latency-ms 2 --jitter-ms 5 &
+    WG_WGCTL_SOCKET=/tmp/wgctl.sock WG_RATE_LIMIT_ENABLED=false uvicorn app.main:app --port 8000 &
+    python -m scripts.loadtest --users 50 --iterations 10 --seed-users --max-p95-ms 500
+
+``--seed-users`` creates (or updates) ``loadtest-<n>`` users directly in
+WG_DATABASE_URL. Each virtual user runs its flows back to back, so the
+one-active-session rule is never hit. The exit code is 1 when a threshold
+(``--max-p95-ms``, ``--max-p99-ms``, ``--min-rps``, ``--max-error-rate``) is
+exceeded, which makes the script usable as a CI regression gate; ``--json``
+writes the report for later comparison. ``make loadtest`` (scripts/loadtest_ci.sh)
+does all of the above with default thresholds; CI runs it on every push.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+import pyotp
+
+LOADTEST_SECRET = "JBSWY3DPEHPK3PXP"
+ENDPOINTS = ("auth_start", "verify_mfa", "create_session", "config", "renew", "revoke")
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, elapsed: float, r: httpx.Response | None) -> None:
+        self.timings[endpoint].append(elapsed)
+        code = r.status_code if r is not None else 0
+        self.statuses[endpoint][code] += 1
+        if r is None or r.status_code >= 400:
+            self.errors[endpoint] += 1
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def seed_users(count: int, password: str) -> None:
+    from app.db import SessionLocal
+    from app.models.user import User
+    from app.services.security import hash_password
+
+    password_hash = hash_password(password)
+    with SessionLocal() as db:
+        existing = {
+            user.username: user
+            for user in db.query(User).filter(User.username.like("loadtest-%")).all()
+        }
+        for i in range(count):
+            username = f"loadtest-{i}"
+            user = existing.get(username) or User(username=username)
+            user.password_hash = password_hash
+            user.mfa_secret = LOADTEST_SECRET
+            user.is_active = True
+            db.add(user)
+        db.commit()
+
+
+async def _call(client: httpx.AsyncClient, stats: Stats, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+    started = time.perf_counter()
+    r = None
+    try:
+        r = await client.request(method, url, **kwargs)
+        return r
+    finally:
+        stats.record(endpoint, time.perf_counter() - started, r)
+
+
+async def _flow(client: httpx.AsyncClient, stats: Stats, username: str, password: str) -> bool:
+    r = await _call(client, stats, "auth_start", "POST", "/v1/auth/start", json={"username": username, "password": password})
+    if r.status_code != 200:
+        return False
+    r = await _call(
+        client, stats, "verify_mfa", "POST", "/v1/auth/verify-mfa",
+        json={"challenge_id": r.json()["challenge_id"], "totp_code": pyotp.TOTP(LOADTEST_SECRET).now()},
+    )
+    if r.status_code != 200:
+        return False
+    tokens = r.json()
+    access = {"Authorization": f"Bearer {tokens['access_token']}"}
+    proof = {"Authorization": f"Bearer {tokens['proof_token']}"}
+
+    pubkey = base64.b64encode(os.urandom(32)).decode()
+    r = await _call(client, stats, "create_session", "POST", "/v1/sessions", json={"client_pubkey": pubkey}, headers=proof)
+    if r.status_code != 200:
+        return False
+    session_id = r.json()["session_id"]
+
+    await _call(client, stats, "config", "POST", f"/v1/sessions/{session_id}/config", headers=proof)
+    await _call(client, stats, "renew", "POST", f"/v1/sessions/{session_id}/renew", headers=proof)
+    r = await _call(client, stats, "revoke", "POST", f"/v1/sessions/{session_id}/revoke", headers=access)
+    return r.status_code == 200
+
+
+async def _virtual_user(client: httpx.AsyncClient, stats: Stats, username: str, password: str, iterations: int) -> None:
+    for _ in range(iterations):
+        try:
+            await _flow(client, stats, username, password)
+        except httpx.HTTPError:
+            # already recorded as a failed call; move on to the next flow
+            pass
+
+
+async def run(args: argparse.Namespace) -> tuple[Stats, float]:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _virtual_user(client, stats, f"loadtest-{i}", args.password, args.iterations)
+                for i in range(args.users)
+            )
+        )
+        wall = time.perf_counter() - started
+    return stats, wall
+
+
+def report(stats: Stats, wall: float) -> dict:
+    result = {"wall_seconds": round(wall, 3), "endpoints": {}}
+    print(f"{'endpoint':<16}{'count':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint in ENDPOINTS:
+        timings = sorted(stats.timings.get(endpoint, []))
+        row = {
+            "count": len(timings),
+            "errors": stats.errors.get(endpoint, 0),
+            "rps": len(timings) / wall if wall else 0.0,
+            "p50_ms": _percentile(timings, 0.50) * 1000,
+            "p95_ms": _percentile(timings, 0.95) * 1000,
+            "p99_ms": _percentile(timings, 0.99) * 1000,
+            "max_ms": (timings[-1] if timings else 0.0) * 1000,
+            "statuses": dict(stats.statuses.get(endpoint, {})),
+        }
+        result["endpoints"][endpoint] = row
+        print(
+            f"{endpoint:<16}{row['count']:>8}{row['errors']:>8}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+        )
+    flows = result["endpoints"]["revoke"]["count"] - result["endpoints"]["revoke"]["errors"]
+    result["flows_per_second"] = flows / wall if wall else 0.0
+    print(f"completed flows: {flows} in {wall:.2f}s ({result['flows_per_second']:.1f}/s)")
+    return result
+
+
+def check_thresholds(result: dict, args: argparse.Namespace) -> list[str]:
+    failures = []
+    for endpoint, row in result["endpoints"].items():
+        if args.max_p95_ms is not None and row["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{endpoint}: p95 {row['p95_ms']:.1f}ms > {args.max_p95_ms}ms")
+        if args.max_p99_ms is not None and row["p99_ms"] > args.max_p99_ms:
+            failures.append(f"{endpoint}: p99 {row['p99_ms']:.1f}ms > {args.max_p99_ms}ms")
+        if row["count"] and row["errors"] / row["count"] > args.max_error_rate:
+            failures.append(f"{endpoint}: error rate {row['errors'] / row['count']:.2%} > {args.max_error_rate:.2%}")
+    if args.min_rps is not None and result["flows_per_second"] < args.min_rps:
+        failures.append(f"flows/s {result['flows_per_second']:.1f} < {args.min_rps}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=5, help="flows per virtual user")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed-users", action="store_true", help="create loadtest-<n> users in WG_DATABASE_URL first")
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    parser.add_argument("--max-p99-ms", type=float, default=None)
+    parser.add_argument("--min-rps", type=float, default=None, help="minimum completed flows per second")
+    parser.add_argument("--max-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    args = parser.parse_args()
+
+    if args.seed_users:
+        seed_users(args.users, args.password)
+
+    stats, wall = asyncio.run(run(args))
+    result = report(stats, wall)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    failures = check_thresholds(result, args)
+    for failure in failures:
+        print(f"THRESHOLD FAILED {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/bin/bash
+# Load test against the fake wgctl with regression thresholds (see scripts/loadtest.py).
+# Needs a migrated Postgres in WG_DATABASE_URL; exits non-zero when a threshold is exceeded.
+set -euo pipefail
+
+SOCKET="${WGCTL_SOCKET:-/tmp/wgctl.sock}"
+PORT="${LOADTEST_PORT:-8000}"
+export WG_WGCTL_SOCKET="$SOCKET"
+export WG_RATE_LIMIT_ENABLED=false
+
+python -m scripts.fake_wgctl --socket "$SOCKET" --latency-ms 2 --jitter-ms 5 &
+WGCTL_PID=$!
+uvicorn app.main:app --port "$PORT" &
+API_PID=$!
+trap 'kill $API_PID $WGCTL_PID 2>/dev/null || true' EXIT
+
+for _ in $(seq 60); do
+    curl -sf -o /dev/null "http://127.0.0.1:$PORT/health" && break
+    sleep 1
+done
+
+python -m scripts.loadtest \
+    --base-url "http://127.0.0.1:$PORT" \
+    --users "${LOADTEST_USERS:-20}" \
+    --iterations "${LOADTEST_ITERATIONS:-5}" \
+    --seed-users \
+    --max-p95-ms "${LOADTEST_MAX_P95_MS:-500}" \
+    --max-p99-ms "${LOADTEST_MAX_P99_MS:-1500}" \
+    --max-error-rate "${LOADTEST_MAX_ERROR_RATE:-0}" \
+    --json "${LOADTEST_REPORT:-loadtest-report.json}"
@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+
+import pytest
+
+# Postgres-backed tests run against a disposable database that they migrate and
+# truncate; without WG_TEST_DATABASE_URL they are skipped.
+TEST_DATABASE_URL = os.environ.get("WG_TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # before any app import: app.db binds its engine to settings.database_url
+    os.environ["WG_DATABASE_URL"] = TEST_DATABASE_URL
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def migrated_db() -> None:
+    if not TEST_DATABASE_URL:
+        pytest.skip("WG_TEST_DATABASE_URL is not set")
+    from alembic import command
+    from alembic.config import Config
+
+    # no ini file: its logging config would disable the loggers tests capture
+    config = Config()
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    command.upgrade(config, "head")
+
+
+@pytest.fixture
+def db(migrated_db):
+    from sqlalchemy import text
+
+    from app.db import SessionLocal, engine
+
+    with engine.begin() as conn:
+        tables = conn.execute(
+            text("SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename <> 'alembic_version'")
+        ).scalars().all()
+        conn.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """A rows-mode 10.9.0.0/29 pool: 6 hosts, 10.9.0.1 reserved."""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "network_cidr", "10.9.0.0/29")
+    monkeypatch.setattr(settings, "ip_pool_mode", "rows")
+    monkeypatch.setattr(settings, "reserved_ips", ["10.9.0.1"])
+
+
+@pytest.fixture
+def make_sessions(db, small_pool):
+    """Factory for ACTIVE sessions of one user, each holding an ASSIGNED IP of the small pool."""
+    from datetime import datetime, timedelta, timezone
+
+    from sqlalchemy import select
+
+    from app.models.ip_pool import IpPool, IpState
+    from app.models.session import Session as SessionModel
+    from app.models.user import User
+    from app.services.ip_pool_init import sync_ip_pool
+
+    sync_ip_pool(db, force=True)
+    user = User(username="bob", password_hash="x", mfa_secret="x")
+    db.add(user)
+    db.commit()
+    made = 0
+
+    def make(count: int, expires_in: timedelta = timedelta(hours=1)) -> list[SessionModel]:
+        nonlocal made
+        expires = datetime.now(timezone.utc) + expires_in
+        rows = [
+            SessionModel(
+                user_id=user.id,
+                expires_at=expires,
+                max_expires_at=expires,
+                ttl_max_seconds=3600,
+                ttl_step_seconds=600,
+                client_pubkey=f"pubkey-{made + i}",
+            )
+            for i in range(count)
+        ]
+        made += count
+        db.add_all(rows)
+        db.flush()
+        free = db.execute(
+            select(IpPool).where(IpPool.state == IpState.FREE).order_by(IpPool.ip).limit(count)
+        ).scalars().all()
+        for ip, sess in zip(free, rows):
+            ip.state, ip.session_id = IpState.ASSIGNED, sess.id
+        db.commit()
+        return rows
+
+    return make
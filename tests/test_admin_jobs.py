@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.admin_job import AdminJob, AdminJobStatus
+from app.models.ip_pool import IpPool, IpState
+from app.models.session import Session as SessionModel, SessionStatus
+from app.models.wg_outbox import WgOutbox
+from app.services import admin_jobs
+from app.services.admin_jobs import JOB_BULK_REVOKE, _claim, create_job, run_pending_jobs
+
+
+@pytest.fixture
+def user_id(make_sessions):
+    """Five ACTIVE sessions of one user, each holding an ASSIGNED IP; returns the user's id."""
+    return make_sessions(5)[0].user_id
+
+
+def _count(db, *where) -> int:
+    return db.execute(select(func.count()).where(*where)).scalar()
+
+
+def test_bulk_revoke_runs_in_chunks(db, user_id, monkeypatch):
+    monkeypatch.setattr(admin_jobs.settings, "admin_job_batch_size", 2)
+    job = create_job(db, JOB_BULK_REVOKE, {"user_id": user_id})
+
+    assert run_pending_jobs() == 1
+    db.expire_all()
+    job = db.get(AdminJob, job.id)
+    assert (job.status, job.total, job.processed) == (AdminJobStatus.DONE, 5, 5)
+    assert _count(db, SessionModel.status == SessionStatus.REVOKED) == 5
+    assert _count(db, IpPool.state == IpState.QUARANTINED) == 5
+    assert _count(db, WgOutbox.op == "remove") == 5
+
+
+def test_stopped_runner_leaves_the_job_running(db, user_id):
+    job = create_job(db, JOB_BULK_REVOKE, {"user_id": user_id})
+    stop = threading.Event()
+    stop.set()
+
+    assert run_pending_jobs(stop) == 0
+    admin_jobs.run_job(job.id, stop)
+    db.expire_all()
+    assert db.get(AdminJob, job.id).status == AdminJobStatus.RUNNING
+    assert _count(db, SessionModel.status == SessionStatus.ACTIVE) == 5
+
+
+def test_job_claimed_by_another_runner_is_skipped(db, user_id):
+    job = create_job(db, JOB_BULK_REVOKE, {"user_id": user_id})
+
+    with _claim(job.id) as claimed:
+        assert claimed
+        assert run_pending_jobs() == 0
+    db.expire_all()
+    assert db.get(AdminJob, job.id).status == AdminJobStatus.PENDING
+    assert run_pending_jobs() == 1
@@ -0,0 +1,49 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from app.db import SessionLocal
+from app.services import audit_partitions
+from app.services.audit import audit_many
+from app.services.audit_partitions import (
+    _partitions,
+    check_default_partition,
+    create_partition_sql,
+    drop_expired_partitions,
+    ensure_partitions,
+)
+
+
+def _old_partitions(db) -> None:
+    for month in (date(2020, 1, 1), date(2020, 2, 1)):
+        db.execute(text(create_partition_sql(month)))
+    audit_many(db, [{"action": "old", "occurred_at": datetime(2020, 1, 15, tzinfo=timezone.utc)}])
+    db.commit()
+
+
+def test_expired_partitions_are_detached_and_dropped(db):
+    assert ensure_partitions(db) == 0  # the migration created them already
+    _old_partitions(db)
+    current = set(_partitions(db)) - {"audit_logs_p202001", "audit_logs_p202002"}
+
+    assert drop_expired_partitions(db, retention_days=365) == ["audit_logs_p202001", "audit_logs_p202002"]
+    assert set(_partitions(db)) == current
+    assert db.execute(text("SELECT to_regclass('audit_logs_p202001')")).scalar() is None
+
+
+def test_detach_gives_up_on_a_busy_table(db, monkeypatch):
+    monkeypatch.setattr(audit_partitions.settings, "audit_partition_lock_timeout_seconds", 0.2)
+    _old_partitions(db)
+    with SessionLocal() as writer:
+        # an open insert holds audit_logs against the ACCESS EXCLUSIVE lock DETACH needs
+        audit_many(writer, [{"action": "busy"}])
+        assert drop_expired_partitions(db, retention_days=365) == []
+    assert "audit_logs_p202001" in _partitions(db)
+    assert drop_expired_partitions(db, retention_days=365) == ["audit_logs_p202001", "audit_logs_p202002"]
+
+
+def test_rows_without_a_monthly_partition_are_reported(db):
+    assert check_default_partition(db) == 0
+    audit_many(db, [{"action": "stray", "occurred_at": datetime(2019, 6, 1, tzinfo=timezone.utc)}])
+    db.commit()
+    assert check_default_partition(db) == 1
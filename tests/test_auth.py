@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.user import User
+from app.services import background
+from app.services.password_pool import password_pool
+from app.services.security import hash_password
+
+MFA_SECRET = "JBSWY3DPEHPK3PXP"
+
+
+class _RefusingExecutor:
+    def submit(self, *args, **kwargs):
+        raise AssertionError("request work must not run on the background executor")
+
+
+@pytest.fixture(scope="module")
+def client():
+    yield TestClient(app)
+    password_pool.shutdown()
+
+
+@pytest.fixture
+def alice(db):
+    user = User(username="alice", password_hash=hash_password("secret"), mfa_secret=MFA_SECRET)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_auth_start_stays_off_the_background_executor(client, alice, monkeypatch):
+    monkeypatch.setattr(background, "_executor", _RefusingExecutor())
+    r = client.post("/v1/auth/start", json={"username": "alice", "password": "secret"})
+    assert r.status_code == 200
+    assert r.json()["mfa_required"]
+    r = client.post("/v1/auth/start", json={"username": "alice", "password": "wrong"})
+    assert r.status_code == 401
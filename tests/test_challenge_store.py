@@ -0,0 +1,103 @@
+import pytest
+
+from app.models.challenge import Challenge, ChallengeType
+from app.models.user import User
+from app.services import challenge_store
+from app.services.challenge_store import (
+    CHALLENGE_MAX_TRIES,
+    ChallengeConsumed,
+    ChallengeExpired,
+    ChallengeForbidden,
+    ChallengeNotFound,
+    ChallengeTooManyTries,
+    DbChallengeStore,
+    MemoryChallengeStore,
+    create_challenge_store,
+)
+
+
+@pytest.fixture
+def store():
+    return MemoryChallengeStore()
+
+
+def test_attempt_and_consume_once(store):
+    record = store.create(None, 7, ChallengeType.LOGIN, 120)
+    assert store.begin_attempt(None, record.id, ChallengeType.LOGIN) == record
+    assert store.consume(None, record.id)
+    assert not store.consume(None, record.id)
+    with pytest.raises(ChallengeConsumed):
+        store.begin_attempt(None, record.id, ChallengeType.LOGIN)
+
+
+def test_unknown_id_or_other_type_is_not_found(store):
+    record = store.create(None, 7, ChallengeType.LOGIN, 120)
+    with pytest.raises(ChallengeNotFound):
+        store.begin_attempt(None, "missing", ChallengeType.LOGIN)
+    with pytest.raises(ChallengeNotFound):
+        store.begin_attempt(None, record.id, ChallengeType.STEPUP)
+
+
+def test_tries_are_limited(store):
+    record = store.create(None, 7, ChallengeType.LOGIN, 120)
+    for _ in range(CHALLENGE_MAX_TRIES):
+        store.begin_attempt(None, record.id, ChallengeType.LOGIN)
+    with pytest.raises(ChallengeTooManyTries):
+        store.begin_attempt(None, record.id, ChallengeType.LOGIN)
+
+
+def test_other_users_attempt_counts_no_try(store):
+    record = store.create(None, 7, ChallengeType.STEPUP, 120)
+    for _ in range(CHALLENGE_MAX_TRIES + 1):
+        with pytest.raises(ChallengeForbidden):
+            store.begin_attempt(None, record.id, ChallengeType.STEPUP, user_id=8)
+    store.begin_attempt(None, record.id, ChallengeType.STEPUP, user_id=7)
+
+
+def test_db_store_other_users_attempt_counts_no_try(db):
+    owner, other = (User(username=name, password_hash="x", mfa_secret="x") for name in ("owner", "other"))
+    db.add_all([owner, other])
+    db.commit()
+    store = DbChallengeStore()
+    record = store.create(db, owner.id, ChallengeType.STEPUP, 120)
+    for _ in range(CHALLENGE_MAX_TRIES + 1):
+        with pytest.raises(ChallengeForbidden):
+            store.begin_attempt(db, record.id, ChallengeType.STEPUP, user_id=other.id)
+    assert db.get(Challenge, record.id).tries == 0
+    assert store.begin_attempt(db, record.id, ChallengeType.STEPUP, user_id=owner.id).user_id == owner.id
+
+
+def test_expired_challenges_are_refused_and_collected(store):
+    record = store.create(None, 7, ChallengeType.LOGIN, 0)
+    with pytest.raises(ChallengeExpired):
+        store.begin_attempt(None, record.id, ChallengeType.LOGIN)
+    live = store.create(None, 8, ChallengeType.LOGIN, 120)
+    assert store.collect_garbage(100) == 0  # create() already purged the expired one
+    store.begin_attempt(None, live.id, ChallengeType.LOGIN)
+
+
+def test_capacity_drops_the_oldest():
+    store = MemoryChallengeStore(max_entries=2)
+    first = store.create(None, 1, ChallengeType.LOGIN, 120)
+    store.create(None, 2, ChallengeType.LOGIN, 120)
+    store.create(None, 3, ChallengeType.LOGIN, 120)
+    with pytest.raises(ChallengeNotFound):
+        store.begin_attempt(None, first.id, ChallengeType.LOGIN)
+
+
+def test_memory_backend_refuses_several_workers(monkeypatch, caplog):
+    monkeypatch.setattr(challenge_store.settings, "challenge_store_backend", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(RuntimeError):
+        create_challenge_store()
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    with caplog.at_level("WARNING", logger=challenge_store.logger.name):
+        assert isinstance(create_challenge_store(), MemoryChallengeStore)
+    # the env check cannot see --workers or replicas, so every start says so
+    assert "kept in this process only" in caplog.text
+
+
+def test_db_backend_is_the_default(monkeypatch):
+    monkeypatch.setattr(challenge_store.settings, "challenge_store_backend", "db")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert isinstance(create_challenge_store(), challenge_store.DbChallengeStore)
@@ -0,0 +1,46 @@
+from sqlalchemy import func, select, text
+
+from app.config import settings
+from app.db import engine
+from app.models.ip_pool import IpPool, IpState
+from app.services.ip_pool_init import sync_ip_pool
+
+
+def _states(db) -> dict[str, int]:
+    rows = db.execute(select(IpPool.state, func.count()).group_by(IpPool.state)).all()
+    db.rollback()
+    return {state.value: n for state, n in rows}
+
+
+def _advisory_locks() -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'")).scalar()
+
+
+def test_sync_leaves_no_advisory_lock_behind(db, small_pool):
+    # several idle connections in the pool: every commit in the middle of the sync hands
+    # the session a different one, so a session-level unlock would miss its lock
+    with engine.connect(), engine.connect(), engine.connect():
+        pass
+    for _ in range(2):
+        assert sync_ip_pool(db, force=True)
+        # checked before the next sync, which would otherwise wait for the leaked lock forever
+        assert _advisory_locks() == 0
+    assert _states(db) == {"FREE": 5}
+
+
+def test_unchanged_definition_is_skipped(db, small_pool):
+    assert sync_ip_pool(db)
+    assert not sync_ip_pool(db)
+
+
+def test_switch_to_rows_frees_addresses_no_longer_reserved(db, small_pool, monkeypatch):
+    monkeypatch.setattr(settings, "ip_pool_mode", "sparse")
+    monkeypatch.setattr(settings, "reserved_ips", ["10.9.0.1", "10.9.0.2"])
+    assert sync_ip_pool(db)
+    assert _states(db) == {"RESERVED": 2}
+
+    monkeypatch.setattr(settings, "ip_pool_mode", "rows")
+    monkeypatch.setattr(settings, "reserved_ips", ["10.9.0.1"])
+    assert sync_ip_pool(db)
+    assert _states(db) == {"FREE": 5}
@@ -0,0 +1,29 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.services.leader import LeaderElector
+
+
+def _advisory_locks() -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'")).scalar()
+
+
+def test_acquire_finishing_after_stop_releases_the_lock(db):
+    elector = LeaderElector(workers=[], lock_name="test:leader")
+    # stop() runs while _try_acquire is still in its executor thread
+    asyncio.run(elector.stop())
+    assert not elector._try_acquire()
+    assert not elector.is_leader
+    assert _advisory_locks() == 0
+
+
+def test_acquire_and_step_down(db):
+    elector = LeaderElector(workers=[], lock_name="test:leader")
+    assert elector._try_acquire()
+    assert _advisory_locks() == 1
+    asyncio.run(elector.stop())
+    assert not elector.is_leader
+    assert _advisory_locks() == 0
@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.pagination import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("key", [42, "3f0c5a1e-8d2b-4c61-9a57-0e4b2f6d1c88"])
+def test_cursor_round_trip(key):
+    at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(at, key)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, type(key)) == (at, key)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "bm90IGpzb24", "WzFd"])
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("key", ["42", 4.2, True, None, [1]])
+def test_cursor_key_of_another_type_is_400(key):
+    cursor = encode_cursor(datetime(2026, 3, 1, tzinfo=timezone.utc), key)
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, int)
+    assert exc.value.status_code == 400
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services import principal_cache
+from app.services.principal_cache import Principal, PrincipalCache
+
+ALICE = Principal(id=1, username="alice", scope="access")
+BOB = Principal(id=2, username="bob", scope="access")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_hit_until_ttl(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=30)
+    cache.put("t1", ALICE, token_exp=clock[0] + 900)
+    assert cache.get("t1") == ALICE
+    clock[0] += 30
+    assert cache.get("t1") is None
+    assert len(cache) == 0
+
+
+def test_never_outlives_the_token(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=30)
+    cache.put("t1", ALICE, token_exp=clock[0] + 5)
+    clock[0] += 5
+    assert cache.get("t1") is None
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = PrincipalCache(max_entries=2, ttl_seconds=30)
+    cache.put("t1", ALICE, token_exp=clock[0] + 900)
+    cache.put("t2", BOB, token_exp=clock[0] + 900)
+    cache.get("t1")
+    cache.put("t3", BOB, token_exp=clock[0] + 900)
+    assert cache.get("t1") == ALICE
+    assert cache.get("t2") is None
+
+
+def test_invalidate_user(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=30)
+    cache.put("t1", ALICE, token_exp=clock[0] + 900)
+    cache.put("t2", ALICE, token_exp=clock[0] + 900)
+    cache.put("t3", BOB, token_exp=clock[0] + 900)
+    assert cache.invalidate_user(ALICE.id) == 2
+    assert cache.get("t1") is None
+    assert cache.get("t3") == BOB
+
+
+def test_zero_ttl_disables_the_cache(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=0)
+    cache.put("t1", ALICE, token_exp=clock[0] + 900)
+    assert cache.get("t1") is None
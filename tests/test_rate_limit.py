@@ -0,0 +1,44 @@
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import MemoryBuckets
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_wait(clock):
+    buckets = MemoryBuckets()
+    assert buckets.take("k", rate=1.0, burst=2) == 0
+    assert buckets.take("k", rate=1.0, burst=2) == 0
+    assert buckets.take("k", rate=1.0, burst=2) == pytest.approx(1.0)
+
+
+def test_tokens_refill_up_to_burst(clock):
+    buckets = MemoryBuckets()
+    for _ in range(2):
+        buckets.take("k", rate=0.5, burst=2)
+    clock[0] += 2
+    assert buckets.take("k", rate=0.5, burst=2) == 0
+    assert buckets.take("k", rate=0.5, burst=2) > 0
+    clock[0] += 3600
+    assert [buckets.take("k", rate=0.5, burst=2) == 0 for _ in range(3)] == [True, True, False]
+
+
+def test_keys_are_independent(clock):
+    buckets = MemoryBuckets()
+    buckets.take("a", rate=1.0, burst=1)
+    assert buckets.take("a", rate=1.0, burst=1) > 0
+    assert buckets.take("b", rate=1.0, burst=1) == 0
+
+
+def test_evicted_key_starts_full(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    buckets.take("a", rate=1.0, burst=1)
+    buckets.take("b", rate=1.0, burst=1)
+    buckets.take("c", rate=1.0, burst=1)
+    assert buckets.take("a", rate=1.0, burst=1) == 0
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db import SessionLocal
+from app.models.audit import AuditLog
+from app.models.ip_pool import IpPool, IpState
+from app.models.session import Session as SessionModel, SessionStatus
+from app.models.wg_outbox import WgOutbox
+from app.services import revoker
+from app.services.revoker import ExpiryDeadlines, _revoke_expired_once
+
+
+def _at(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+@pytest.fixture
+def deadlines():
+    loop = asyncio.new_event_loop()
+    wakeup = asyncio.Event()
+    deadlines = ExpiryDeadlines()
+    deadlines.bind(loop, wakeup)
+    yield deadlines
+    deadlines.unbind()
+    loop.close()
+
+
+def test_unbound_schedule_is_ignored():
+    deadlines = ExpiryDeadlines()
+    deadlines.schedule("s1", _at(100))
+    assert len(deadlines) == 0
+    assert deadlines.next_deadline() is None
+
+
+def test_next_deadline_is_the_earliest(deadlines):
+    deadlines.schedule("s1", _at(300))
+    deadlines.schedule("s2", _at(100))
+    deadlines.schedule("s3", _at(200))
+    assert deadlines.next_deadline() == 100
+
+
+def test_reschedule_supersedes_the_old_deadline(deadlines):
+    deadlines.schedule("s1", _at(100))
+    deadlines.schedule("s1", _at(500))
+    assert len(deadlines) == 1
+    assert deadlines.next_deadline() == 500
+    assert deadlines.pop_due(400) == 0
+
+
+def test_discarded_sessions_are_not_due(deadlines):
+    deadlines.schedule("s1", _at(100))
+    deadlines.schedule("s2", _at(200))
+    deadlines.discard("s1")
+    assert deadlines.next_deadline() == 200
+    assert deadlines.pop_due(300) == 1
+    assert len(deadlines) == 0
+    assert deadlines.next_deadline() is None
+
+
+def _count(db, *where) -> int:
+    count = db.execute(select(func.count()).where(*where)).scalar()
+    db.rollback()
+    return count
+
+
+def test_sweep_expires_due_sessions_in_chunks(db, make_sessions, monkeypatch):
+    monkeypatch.setattr(revoker.settings, "revoker_batch_size", 2)
+    due = make_sessions(4, expires_in=timedelta(seconds=-1))
+    make_sessions(1)
+
+    # a session locked by a concurrent request is skipped, not waited for
+    with SessionLocal() as other:
+        other.execute(select(SessionModel).where(SessionModel.id == due[0].id).with_for_update())
+        assert _revoke_expired_once() == 3
+    assert _revoke_expired_once() == 1
+
+    assert _count(db, SessionModel.status == SessionStatus.EXPIRED) == 4
+    assert _count(db, SessionModel.status == SessionStatus.ACTIVE) == 1
+    # each expiry quarantines its IP, queues the peer removal and is audited
+    assert _count(db, IpPool.state == IpState.QUARANTINED) == 4
+    assert _count(db, WgOutbox.op == "remove") == 4
+    assert _count(db, AuditLog.action == "session_expired") == 4
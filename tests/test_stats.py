@@ -0,0 +1,42 @@
+from sqlalchemy import select
+
+from app.models.session import SessionStatus
+from app.models.stats import StatsCounter
+from app.services.ip_pool_init import sync_ip_pool
+from app.services.stats import RECOUNT_SHARD, count_change, read_counters, recount, session_status_changed
+
+
+def test_deltas_are_applied_on_commit(db):
+    session_status_changed(db, None, SessionStatus.ACTIVE, 3)
+    session_status_changed(db, SessionStatus.ACTIVE, SessionStatus.REVOKED)
+    db.commit()
+    assert read_counters(db) == {"sessions.ACTIVE": 2, "sessions.REVOKED": 1}
+
+
+def test_deltas_are_dropped_on_rollback(db):
+    session_status_changed(db, None, SessionStatus.ACTIVE)
+    db.rollback()
+    db.commit()
+    assert read_counters(db) == {}
+
+
+def test_recount_adds_the_drift_as_one_delta(db, small_pool):
+    sync_ip_pool(db, force=True)
+    assert read_counters(db)["ip_pool.FREE"] == 5
+    count_change(db, "ip_pool.FREE", 2)
+    db.commit()
+    before = _correction(db, "ip_pool.FREE")
+
+    assert recount(db) == {"ip_pool.FREE": -2}
+    assert read_counters(db)["ip_pool.FREE"] == 5
+    # only the correction row moved, the shards written by commits are left alone
+    assert _correction(db, "ip_pool.FREE") == before - 2
+    assert recount(db) == {}
+
+
+def _correction(db, name: str) -> int:
+    value = db.execute(
+        select(StatsCounter.value).where(StatsCounter.name == name, StatsCounter.shard == RECOUNT_SHARD)
+    ).scalar()
+    db.rollback()
+    return value or 0
@@ -0,0 +1,91 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.models.wg_outbox import WgOutbox
+from app.services import wg_outbox
+from app.services.wg_outbox import dispatch_once, enqueue_peer_ops, merge_ops
+from app.services.wireguard import PeerOp, PeerResult
+
+
+def test_unsent_add_then_remove_cancels_out():
+    rows = [(1, "add", "s1", "k1", "10.0.0.2/32", 0), (2, "remove", "s1", "k1", None, 0)]
+    assert merge_ops(rows) == [(None, [1, 2], 0)]
+
+
+def test_attempted_add_then_remove_still_removes():
+    # the add may have reached the gateway before it failed
+    rows = [(1, "add", "s1", "k1", "10.0.0.2/32", 2), (2, "remove", "s1", "k1", None, 0)]
+    assert merge_ops(rows) == [(PeerOp("remove", "s1", "k1", None), [1, 2], 2)]
+
+
+def test_remove_then_add_keeps_the_add():
+    rows = [(1, "remove", "s1", "k1", None, 0), (2, "add", "s2", "k1", "10.0.0.3/32", 0)]
+    assert merge_ops(rows) == [(PeerOp("add", "s2", "k1", "10.0.0.3/32"), [1, 2], 0)]
+
+
+def test_pubkeys_are_merged_separately():
+    rows = [
+        (1, "add", "s1", "k1", "10.0.0.2/32", 0),
+        (2, "add", "s2", "k2", "10.0.0.3/32", 1),
+        (3, "remove", None, "k2", None, 0),
+    ]
+    assert merge_ops(rows) == [
+        (PeerOp("add", "s1", "k1", "10.0.0.2/32"), [1], 0),
+        (PeerOp("remove", "-", "k2", None), [2, 3], 1),
+    ]
+
+
+class _FakeService:
+    """Answers each pubkey as told: "ok", "fail" or "refused" (circuit open)."""
+
+    def __init__(self, outcomes: dict[str, str]) -> None:
+        self.outcomes = outcomes
+        self.sent: list[PeerOp] = []
+
+    async def apply(self, ops: list[PeerOp]) -> list[PeerResult]:
+        self.sent += ops
+        results = []
+        for op in ops:
+            outcome = self.outcomes[op.pubkey]
+            error = None if outcome == "ok" else "boom"
+            results.append(PeerResult(op=op, ok=outcome == "ok", error=error, attempted=outcome != "refused"))
+        return results
+
+
+def _rows(db) -> dict[str, list[tuple[str, int, str | None]]]:
+    rows = db.execute(select(WgOutbox).order_by(WgOutbox.id)).scalars().all()
+    outbox: dict[str, list[tuple[str, int, str | None]]] = {}
+    for row in rows:
+        outbox.setdefault(row.pubkey, []).append((row.op, row.attempts, row.last_error))
+    db.rollback()
+    return outbox
+
+
+def test_dispatch_applies_merges_and_backs_off(db, monkeypatch):
+    service = _FakeService({"k2": "ok", "k3": "fail", "k4": "refused"})
+    monkeypatch.setattr(wg_outbox, "async_wireguard_service", service)
+    enqueue_peer_ops(
+        db,
+        [
+            PeerOp("add", "s1", "k1", "10.0.0.2/32"),
+            PeerOp("add", "s2", "k2", "10.0.0.3/32"),
+            PeerOp("remove", "s3", "k3", None),
+            PeerOp("add", "s4", "k4", "10.0.0.5/32"),
+            PeerOp("remove", "s1", "k1", None),
+        ],
+    )
+    db.commit()
+
+    assert asyncio.run(dispatch_once()) == 5
+    # k1 was added and removed before anything was sent: nothing to send
+    assert [op.pubkey for op in service.sent] == ["k2", "k3", "k4"]
+    # applied and cancelled rows are gone, a failure backs off, a refused op is left as it was
+    assert _rows(db) == {"k3": [("remove", 1, "boom")], "k4": [("add", 0, None)]}
+
+    # the next op on a pubkey that is backing off waits behind it
+    enqueue_peer_ops(db, [PeerOp("add", "s5", "k3", "10.0.0.4/32")])
+    db.commit()
+    service.sent.clear()
+    assert asyncio.run(dispatch_once()) == 1
+    assert [op.pubkey for op in service.sent] == ["k4"]
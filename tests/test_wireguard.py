@@ -0,0 +1,95 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import wireguard
+from app.services.wireguard import (
+    AsyncWireGuardService,
+    CircuitBreaker,
+    CircuitOpenError,
+    PeerOp,
+    WireGuardService,
+    _batch_results,
+    _failed,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(wireguard.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_success_resets_the_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.available()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # only one probe per reset period
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_batch_results_fail_ops_without_a_result():
+    ops = [PeerOp("remove", f"s{i}", f"k{i}") for i in range(3)]
+    r = httpx.Response(200, json={"results": [{"ok": True, "action": "removed"}]})
+    results = _batch_results(ops, r)
+    assert [(result.op, result.ok) for result in results] == [(ops[0], True), (ops[1], False), (ops[2], False)]
+
+
+def test_circuit_open_ops_are_not_attempted():
+    ops = [PeerOp("add", "s1", "k1", "10.0.0.2/32")]
+    assert not _failed(ops, CircuitOpenError("open"))[0].attempted
+    assert _failed(ops, httpx.ConnectError("down"))[0].attempted
+
+
+@pytest.fixture
+def open_breaker(clock, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    monkeypatch.setattr(wireguard, "wgctl_breaker", breaker)
+
+
+def test_single_peer_fallback_marks_refused_ops_unattempted(open_breaker):
+    ops = [PeerOp("add", "s1", "k1", "10.0.0.2/32"), PeerOp("remove", "s2", "k2")]
+    service = WireGuardService()
+    service._batch_supported = False
+    assert [(r.ok, r.attempted) for r in service.apply(ops)] == [(False, False), (False, False)]
+
+    async_service = AsyncWireGuardService()
+    async_service._batch_supported = False
+    results = asyncio.run(async_service.apply(ops))
+    assert [(r.ok, r.attempted) for r in results] == [(False, False), (False, False)]